@@ -1,4 +1,5 @@
 from flask import Flask
+from app import config
 
 def create_app():
     app = Flask(
@@ -7,7 +8,24 @@ def create_app():
         static_url_path="/static"
     )
 
-    from app.main.routes import main
+    from app.main.routes import main, WARMUP
+    from app.utils.metrics import METRICS
     app.register_blueprint(main)
+    METRICS.enabled = config.METRICS
+
+    # Opt-in profiling of sampled or slow requests
+    if config.PROFILE:
+        from app.utils.profiling import RequestProfiler, parse_routes
+        RequestProfiler(
+            config.PROFILE_DIR, config.PROFILE, config.PROFILE_EVERY, parse_routes(config.PROFILE_ROUTES),
+            config.PROFILE_SLOW_MS, config.PROFILE_KEEP, config.PROFILE_INTERVAL_MS,
+        ).init_app(app)
+
+    # Load datasets and models in background threads unless configured otherwise
+    if config.WARMUP in ("background", "eager"):
+        WARMUP.start()
+    if config.WARMUP == "eager":
+        for name in WARMUP.stages:
+            WARMUP.get(name)
 
     return app
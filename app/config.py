@@ -0,0 +1,105 @@
+"""
+Runtime settings, read from environment variables with sensible defaults.
+"""
+import os
+
+
+def env_int(name: str, default: int) -> int:
+    value = os.environ.get(name, "").strip()
+    return int(value) if value else default
+
+
+def env_float(name: str, default: float) -> float:
+    value = os.environ.get(name, "").strip()
+    return float(value) if value else default
+
+
+def env_bool(name: str, default: bool) -> bool:
+    value = os.environ.get(name, "").strip().lower()
+    return value in ("1", "true", "yes", "on") if value else default
+
+
+def env_str(name: str, default: str) -> str:
+    return os.environ.get(name, "").strip() or default
+
+
+# Data files, relative to the working directory; FAISS indexes sit next to the embeddings
+DATA_PATH = "data/final/books_translated.csv"
+EMB_PATH = "data/final/embeddings.npy"
+NEIGHBOR_IDS_PATH = "data/final/neighbors_ids.npy"
+NEIGHBOR_SIMS_PATH = "data/final/neighbors_sims.npy"
+
+# Quick Pick result sets behind pagination cursors: entries, seconds before expiry and total size of the cached ids
+QUICK_CACHE_ENTRIES = env_int("READMEUP_QUICK_CACHE_ENTRIES", 256)
+QUICK_CACHE_TTL = env_float("READMEUP_QUICK_CACHE_TTL", 600.0)
+QUICK_CACHE_MAX_MB = env_int("READMEUP_QUICK_CACHE_MAX_MB", 32)
+
+# Deep Dive query embedding cache (entries; an empty path disables persistence)
+QUERY_CACHE_SIZE = env_int("READMEUP_QUERY_CACHE_SIZE", 1024)
+QUERY_CACHE_PATH = env_str("READMEUP_QUERY_CACHE_PATH", "")
+
+# Micro-batching of concurrent Deep Dive query encodings (a window of 0 disables it)
+ENCODER_BATCH_WINDOW_MS = env_float("READMEUP_ENCODER_BATCH_WINDOW_MS", 5.0)
+ENCODER_MAX_BATCH = env_int("READMEUP_ENCODER_MAX_BATCH", 32)
+
+# Vector index served at runtime (flat, ivf, hnsw or ivfpq; built with app.models.index_builder)
+INDEX_TYPE = env_str("READMEUP_INDEX_TYPE", "flat")
+INDEX_NPROBE = env_int("READMEUP_INDEX_NPROBE", 0)        # 0 keeps the value stored in the index
+INDEX_EF_SEARCH = env_int("READMEUP_INDEX_EF_SEARCH", 0)  # 0 keeps the value stored in the index
+
+# Query embedder backend: torch (SentenceTransformer), onnx (built with app.models.export_onnx)
+# or stub (hash-seeded random vectors: no model download, for offline benchmarks only)
+EMBEDDER_BACKEND = env_str("READMEUP_EMBEDDER_BACKEND", "torch")
+ONNX_MODEL_PATH = env_str("READMEUP_ONNX_MODEL_PATH", "data/final/minilm-int8.onnx")
+ONNX_THREADS = env_int("READMEUP_ONNX_THREADS", 0)  # 0 lets ONNX Runtime decide
+STUB_EMBEDDER_DIM = env_int("READMEUP_STUB_EMBEDDER_DIM", 384)  # must match the embeddings
+
+# Startup: "background" warms every stage in threads, "lazy" loads each on first use,
+# "eager" blocks app creation until all are loaded
+WARMUP = env_str("READMEUP_WARMUP", "background")
+WARMUP_WAIT_SECONDS = env_float("READMEUP_WARMUP_WAIT_SECONDS", 30.0)  # per request, before a 503
+
+# Memory-map the embeddings and vector index read-only, so pre-forked workers share their pages
+MMAP_ARTIFACTS = env_bool("READMEUP_MMAP", False)
+
+# Load the catalogue from its binary snapshot (rebuilt automatically when the CSV or embeddings change)
+CATALOGUE_SNAPSHOT = env_bool("READMEUP_CATALOGUE_SNAPSHOT", True)
+
+# JSON API limits; batches run as vectorized passes of API_BATCH_CHUNK items
+API_MAX_BATCH = env_int("READMEUP_API_MAX_BATCH", 1000)
+API_MAX_TOP_N = env_int("READMEUP_API_MAX_TOP_N", 50)
+API_MAX_PAGE_SIZE = env_int("READMEUP_API_MAX_PAGE_SIZE", 100)
+API_BATCH_CHUNK = env_int("READMEUP_API_BATCH_CHUNK", 64)
+
+# Smart Match / Deep Dive result cache. Each request draws one of RESULT_VARIANTS
+# variation seeds, so repeated requests still vary but are served from the cache
+# (0 variants turns caching off and keeps every response freshly random)
+RESULT_VARIANTS = env_int("READMEUP_RESULT_VARIANTS", 4)
+RESULT_CACHE_ENTRIES = env_int("READMEUP_RESULT_CACHE_ENTRIES", 4096)
+RESULT_CACHE_TTL = env_float("READMEUP_RESULT_CACHE_TTL", 3600.0)
+RESULT_CACHE_MAX_MB = env_int("READMEUP_RESULT_CACHE_MAX_MB", 16)
+
+# Deep Dive retrieval: hybrid (vectors + BM25 keywords, rank-fused), semantic or lexical.
+# Queries fall back to lexical (no encoder call) while this many encodings are queued (0 = never)
+DEEP_RETRIEVAL = env_str("READMEUP_DEEP_RETRIEVAL", "hybrid")
+LEXICAL_FALLBACK_BACKLOG = env_int("READMEUP_LEXICAL_FALLBACK_BACKLOG", 0)
+
+# Per-stage latency histograms, counters and cache hit rates on /metrics (Prometheus text),
+# and the same stage timings in a Server-Timing response header
+METRICS = env_bool("READMEUP_METRICS", True)
+SERVER_TIMING = env_bool("READMEUP_SERVER_TIMING", False)
+
+# Live request profiling: "" (off), sample (stack sampler; also keeps requests slower than
+# PROFILE_SLOW_MS) or cprofile. Profiles one in PROFILE_EVERY requests, overridden per endpoint
+# by PROFILE_ROUTES ("deep_dive=10,quick_pick=0"); the newest PROFILE_KEEP dumps are kept
+PROFILE = env_str("READMEUP_PROFILE", "")
+PROFILE_EVERY = env_int("READMEUP_PROFILE_EVERY", 100)
+PROFILE_ROUTES = env_str("READMEUP_PROFILE_ROUTES", "")
+PROFILE_SLOW_MS = env_float("READMEUP_PROFILE_SLOW_MS", 0.0)
+PROFILE_DIR = env_str("READMEUP_PROFILE_DIR", "profiles")
+PROFILE_KEEP = env_int("READMEUP_PROFILE_KEEP", 200)
+PROFILE_INTERVAL_MS = env_float("READMEUP_PROFILE_INTERVAL_MS", 5.0)
+
+# /debug/memory: memory held by each loaded artifact and by the process (walks every
+# loaded object, so it takes a while on large catalogues; off by default)
+MEMORY_REPORT = env_bool("READMEUP_MEMORY_REPORT", False)
@@ -0,0 +1,251 @@
+import json
+import math
+import re
+from flask import Response, jsonify, request
+from . import main
+from app.main.routes import RESULT_CACHE, deep_retrieval, quick_page, stage_value, variation_seed
+from app.models.smart_model import knn_recommend_batch, resolve_book
+from app.models.deep_model import RETRIEVAL_MODES, SCORE_KINDS, semantic_recommend_batch
+from app.utils.metrics import METRICS
+from app import config
+
+# Book fields returned by the API (plus "score" for Deep Dive)
+BOOK_FIELDS = ["title", "author", "rating", "genres", "language", "publisher", "coverImg", "description"]
+
+
+class ApiError(ValueError):
+    """Invalid API request; answered with a 400 and the message."""
+
+
+@main.errorhandler(ApiError)
+def api_error(exc):
+    return jsonify(error=str(exc)), 400
+
+
+def _payload() -> dict:
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        raise ApiError("Expected a JSON object body")
+    return payload
+
+
+def _int(payload, key, default, low, high):
+    value = payload.get(key, default)
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ApiError(f"{key} must be an integer")
+    try:
+        value = int(value)
+    except ValueError:
+        raise ApiError(f"{key} must be an integer") from None
+    if not low <= value <= high:
+        raise ApiError(f"{key} must be between {low} and {high}")
+    return value
+
+
+def _str(payload, key, default=""):
+    """String field of ``payload``; a missing or null field reads as ``default``."""
+    value = payload.get(key)
+    if value is None:
+        return default
+    if not isinstance(value, str):
+        raise ApiError(f"{key} must be a string")
+    return value
+
+
+def _bool(payload, key, default=False):
+    """JSON boolean field of ``payload``; a missing or null field reads as ``default``."""
+    value = payload.get(key)
+    if value is None:
+        return default
+    if not isinstance(value, bool):
+        raise ApiError(f"{key} must be true or false")
+    return value
+
+
+def _float(payload, key, default):
+    try:
+        return float(payload.get(key, default) or 0.0)
+    except (TypeError, ValueError):
+        raise ApiError(f"{key} must be a number") from None
+
+
+def _books(results) -> list:
+    """JSON-safe records of a results DataFrame, keyed by row id."""
+    if results is None or results.empty:
+        return []
+    fields = [f for f in BOOK_FIELDS + ["score"] if f in results.columns]
+    books = []
+    with METRICS.stage("api.records"):
+        for row_id, record in zip(results.index, results[fields].to_dict(orient="records")):
+            for key, value in record.items():
+                if isinstance(value, float) and math.isnan(value):
+                    record[key] = None
+            books.append({"id": int(row_id), **record})
+    return books
+
+
+def _batch_items(payload, key):
+    items = payload.get(key)
+    if not isinstance(items, list) or not items:
+        raise ApiError(f"{key} must be a non-empty list")
+    if len(items) > config.API_MAX_BATCH:
+        raise ApiError(f"At most {config.API_MAX_BATCH} {key} per request")
+    return items
+
+
+def _wants_jsonl() -> bool:
+    return request.args.get("format") == "jsonl" or "application/x-ndjson" in request.headers.get("Accept", "")
+
+
+def _batch_response(items, run):
+    """
+    Runs ``run`` over ``items`` in chunks of READMEUP_API_BATCH_CHUNK, streamed
+    as JSON Lines when asked for (one line per item, as each chunk completes).
+    """
+    def chunks():
+        for start in range(0, len(items), config.API_BATCH_CHUNK):
+            for offset, result in enumerate(run(items[start:start + config.API_BATCH_CHUNK])):
+                yield {"index": start + offset, **result}
+
+    if _wants_jsonl():
+        return Response((json.dumps(result) + "\n" for result in chunks()), mimetype="application/x-ndjson")
+    return jsonify(results=list(chunks()))
+
+
+@main.route("/api/quick-pick", methods=["POST"])
+def api_quick_pick():
+    """Quick Pick results as JSON; pass the returned cursor back to page through the same result set"""
+    df_quick, _, quick_index = stage_value("quick")
+    payload = _payload()
+    genres = payload.get("genres") or []
+    if isinstance(genres, str):
+        genres = [genres]
+    if not isinstance(genres, list) or not all(isinstance(g, str) for g in genres):
+        raise ApiError("genres must be a string or a list of strings")
+    filters = (
+        _str(payload, "title").strip(), _str(payload, "author").strip(), genres, _str(payload, "language"), "",
+    )
+    page_size = _int(payload, "page_size", 20, 1, config.API_MAX_PAGE_SIZE)
+    page = _int(payload, "page", 1, 1, 10**9)
+    order_by = _str(payload, "order_by", "rating (high to low)")
+
+    # Title, author and language are regular expressions, as in the form
+    try:
+        page_ids, total, n_pages, cursor = quick_page(
+            df_quick, quick_index, filters, order_by, page, page_size, _str(payload, "cursor")
+        )
+    except re.error as exc:
+        raise ApiError(f"Invalid pattern: {exc}") from None
+    return jsonify(total=total, page=page, n_pages=n_pages, cursor=cursor, books=_books(df_quick.iloc[page_ids]))
+
+
+def _seed(item) -> dict:
+    """A Smart Match seed as {"book_id": int} or {"title": str}."""
+    if not isinstance(item, dict):
+        item = {"book_id": item} if isinstance(item, int) and not isinstance(item, bool) else {"title": item}
+    if item.get("book_id") is not None:
+        return {"book_id": _int(item, "book_id", -1, 0, 10**12)}
+    title = _str(item, "title")
+    if not title.strip():
+        raise ApiError("Every seed needs a book_id or a title")
+    return {"title": title}
+
+
+def _seed_param(payload):
+    """Variation seed: the one given (same seed, same picks), else a cached variant."""
+    if "variation_seed" not in payload:
+        return variation_seed()
+    return variation_seed(_int(payload, "variation_seed", 0, 0, 2**32 - 1))
+
+
+def _smart_run(payload):
+    """Recommender for lists of seeds sharing the options of ``payload``, one batch per call."""
+    df_smart, lookup = stage_value("smart")
+    embedding_matrix, vector_index = stage_value("vectors")
+    neighbor_table = stage_value("neighbors")
+    top_n = _int(payload, "top_n", 5, 1, config.API_MAX_TOP_N)
+    exclude_series = _bool(payload, "exclude_series")
+    exclude_author = _bool(payload, "exclude_author")
+    variation = _seed_param(payload)
+
+    def run(seeds):
+        row_ids = []
+        for seed in seeds:
+            if "book_id" in seed:
+                row_ids.append(seed["book_id"])
+            else:
+                matches = resolve_book(seed["title"], df_smart, lookup)
+                row_ids.append(int(matches[0]) if len(matches) else -1)
+        outputs = knn_recommend_batch(
+            row_ids, exclude_series, exclude_author, top_n, df_smart, embedding_matrix, vector_index, lookup,
+            neighbor_table=neighbor_table, seed=variation, result_cache=RESULT_CACHE,
+        )
+        return [
+            {**seed, "variation_seed": variation, "message": message, "books": _books(results)}
+            for seed, (results, message) in zip(seeds, outputs)
+        ]
+    return run
+
+
+@main.route("/api/smart-match", methods=["POST"])
+def api_smart_match():
+    """Smart Match for one seed book, given by "book_id" or "title" """
+    payload = _payload()
+    return jsonify(_smart_run(payload)([_seed(payload)])[0])
+
+
+@main.route("/api/smart-match/batch", methods=["POST"])
+def api_smart_match_batch():
+    """Smart Match for many "seeds" (ids, titles or objects) sharing one set of options"""
+    payload = _payload()
+    seeds = [_seed(item) for item in _batch_items(payload, "seeds")]
+    return _batch_response(seeds, _smart_run(payload))
+
+
+def _query(item, defaults) -> dict:
+    """A Deep Dive request with the batch-level defaults filled in."""
+    item = item if isinstance(item, dict) else {"query": item}
+    return {
+        "query": _str(item, "query"),
+        "language": _str(item, "language", defaults.get("language")) or None,
+        "min_rating": _float(item, "min_rating", defaults.get("min_rating", 0.0)),
+        "top_n": _int(item, "top_n", defaults.get("top_n", 5), 1, config.API_MAX_TOP_N),
+        "seed": _seed_param(item) if "variation_seed" in item or "seed" not in defaults else defaults["seed"],
+    }
+
+
+def _deep_run(payload):
+    """Recommender for lists of queries: one encoding pass and one search per filter."""
+    df_deep, deep_filters = stage_value("deep")
+    mode = payload.get("mode")
+    if mode is not None and mode not in RETRIEVAL_MODES:
+        raise ApiError(f"mode must be one of {', '.join(RETRIEVAL_MODES)}")
+    mode, embedder, query_cache, vector_index, lexical_index = deep_retrieval(mode)
+
+    def run(requests):
+        outputs = semantic_recommend_batch(
+            requests, df_deep, embedder, vector_index, query_cache=query_cache, filters=deep_filters,
+            result_cache=RESULT_CACHE, lexical_index=lexical_index, mode=mode,
+        )
+        return [
+            {"query": req["query"], "mode": mode, "score_kind": SCORE_KINDS[mode], "variation_seed": req["seed"],
+             "message": message, "books": _books(results)}
+            for req, (results, message) in zip(requests, outputs)
+        ]
+    return run
+
+
+@main.route("/api/deep-dive", methods=["POST"])
+def api_deep_dive():
+    """Deep Dive for one free-text "query" with optional language, min_rating, top_n and mode"""
+    payload = _payload()
+    return jsonify(_deep_run(payload)([_query(payload, {})])[0])
+
+
+@main.route("/api/deep-dive/batch", methods=["POST"])
+def api_deep_dive_batch():
+    """Deep Dive for many "queries" (strings, or objects overriding the batch language, min_rating, top_n), one mode"""
+    payload = _payload()
+    defaults = _query(payload, {})
+    queries = [_query(item, defaults) for item in _batch_items(payload, "queries")]
+    return _batch_response(queries, _deep_run(payload))
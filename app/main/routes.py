@@ -1,38 +1,235 @@
-from flask import render_template, request
+from flask import Response, g, jsonify, render_template, request
 from . import main
+import atexit
+import secrets
+import time
 import numpy as np
 
 # Quick Pick imports
-from app.models.quick_model import load_df, apply_multi_filter
-from app.utils.sorting import sort_df_by_title_lns, sort_lns_iterable
+from app.models.quick_model import load_df, filter_row_ids, order_page
+from app.utils.result_cache import ResultSetCache, RecommendationCache
 
 # Smart Match imports  
 from app.models.smart_model import load_df_knn, prepare_knn, knn_recommend
+from app.models.neighbor_table import load_neighbor_table
 
 # Deep Dive imports
-from app.models.deep_model import load_dataset, load_embedder, load_faiss_artifacts, semantic_recommend
+from app.models.deep_model import (
+    load_dataset, load_embedder, load_embeddings, load_faiss_artifacts, semantic_recommend, SearchFilters,
+    build_lexical_index, RETRIEVAL_MODES,
+)
+from app.utils.embedding_cache import QueryEmbeddingCache
+from app.utils.batch_encoder import BatchingEncoder
 
-# Global data loading
-DATA_PATH = "data/final/books_translated.csv"
+# Shared
+from app.models.catalogue import load_catalogue
+from app.utils.warmup import Warmup, NotReady
+from app.utils.metrics import METRICS, server_timing
+from app.utils.memory import memory_report
+from app import config
+from app.config import DATA_PATH
 
-# Load data once at startup
-df_quick, GENRES, TITLES, AUTHORS = load_df(DATA_PATH)
-df_smart = load_df_knn(DATA_PATH)
-embedding_matrix = np.load("data/final/embeddings.npy")
-knn_model = prepare_knn(df_smart, embedding_matrix)
+# Datasets, indexes and models load as warm-up stages (started by create_app), so the
+# app accepts connections at once and each mode serves as soon as its stages are ready
+WARMUP = Warmup()
 
-df_deep = load_dataset()
-embedder = load_embedder()
-faiss_index, embeddings = load_faiss_artifacts()
+@WARMUP.stage("catalogue")
+def _load_catalogue():
+    return load_catalogue(DATA_PATH)
+
+@WARMUP.stage("quick", deps=["catalogue"])
+def _load_quick(_):
+    return load_df(DATA_PATH)
+
+@WARMUP.stage("smart", deps=["catalogue"])
+def _load_smart(_):
+    return load_df_knn(DATA_PATH)
+
+@WARMUP.stage("deep", deps=["catalogue"])
+def _load_deep(_):
+    df_deep = load_dataset()
+    return df_deep, SearchFilters(df_deep)
+
+@WARMUP.stage("lexical", deps=["deep"])
+def _load_lexical(deep):
+    return build_lexical_index(deep[0])
+
+@WARMUP.stage("vectors")
+def _load_vectors():
+    # One vector index over the embeddings, shared by Smart Match and Deep Dive
+    faiss_index, embedding_matrix = load_faiss_artifacts()
+    if embedding_matrix is None:
+        embedding_matrix = load_embeddings()
+    return embedding_matrix, prepare_knn(None, embedding_matrix, faiss_index)
+
+@WARMUP.stage("neighbors", deps=["catalogue"])
+def _load_neighbors(catalogue):
+    # Rejected (live kNN instead) when built for another catalogue or embeddings
+    return load_neighbor_table(fingerprint=catalogue.fingerprint, rows=len(catalogue))
+
+@WARMUP.stage("embedder")
+def _load_embedder():
+    embedder = load_embedder()
+    if config.ENCODER_BATCH_WINDOW_MS > 0:
+        embedder = BatchingEncoder(embedder, config.ENCODER_BATCH_WINDOW_MS, config.ENCODER_MAX_BATCH)
+    query_cache = QueryEmbeddingCache(config.QUERY_CACHE_SIZE, config.QUERY_CACHE_PATH)
+    # Inherited by pre-forked workers; only those that encoded queries write (merging into the file)
+    if query_cache.path:
+        atexit.register(query_cache.save)
+    return embedder, query_cache
+
+# Stages each mode needs before it can serve
+MODE_STAGES = {
+    "quick": ("quick",),
+    "smart": ("smart", "vectors", "neighbors"),
+    "deep": ("deep", "vectors", "embedder", "lexical"),
+}
+
+def stage_value(name):
+    """Value of a warm-up stage, waiting up to READMEUP_WARMUP_WAIT_SECONDS for it."""
+    return WARMUP.get(name, timeout=config.WARMUP_WAIT_SECONDS)
+
+def quick_page(df_quick, quick_index, filters, order_by, page, page_size, cursor=""):
+    """
+    Row ids on ``page`` of the Quick Pick results for ``filters``, with the total,
+    the page count and the cursor identifying the (shuffled) result set.
+    """
+    # Reuse the cached result set when paging, otherwise apply filters
+    title_kw, author_kw, genre_kw, lang_kw, pub_kw = filters
+    signature = (title_kw, author_kw, tuple(genre_kw), lang_kw, pub_kw)
+    cached = QUICK_RESULTS.get(cursor, signature)
+    if cached is not None:
+        _, row_ids = cached
+    else:
+        seed = secrets.randbits(32)
+        with METRICS.stage("quick.filter"):
+            row_ids = filter_row_ids(
+                df_quick, title_kw, author_kw, genre_kw, lang_kw, pub_kw, seed=seed, search_index=quick_index
+            )
+        cursor = QUICK_RESULTS.put(signature, seed, row_ids)
+
+    # Pagination logic
+    n_pages = max(1, int(np.ceil(len(row_ids) / page_size)))
+    start = (page - 1) * page_size
+    end = start + page_size
+
+    # Apply sorting, ordering only the rows needed for this page
+    with METRICS.stage("quick.order"):
+        page_ids = order_page(df_quick, row_ids, order_by, start, end)
+    return page_ids, len(row_ids), n_pages, cursor
+
+@main.errorhandler(NotReady)
+def not_ready(exc):
+    if request.path.startswith("/api/"):
+        return jsonify(error=str(exc)), 503, {"Retry-After": "5"}
+    return f"{exc}, please try again in a moment.", 503, {"Retry-After": "5"}
+
+# Quick Pick result sets, so later pages are slices of the same shuffled ids
+QUICK_RESULTS = ResultSetCache(
+    config.QUICK_CACHE_ENTRIES, config.QUICK_CACHE_TTL, config.QUICK_CACHE_MAX_MB * 1024 * 1024
+)
+
+# Finished Smart Match / Deep Dive recommendations, keyed by request and variation seed
+RESULT_CACHE = RecommendationCache(
+    config.RESULT_CACHE_ENTRIES, config.RESULT_CACHE_TTL, config.RESULT_CACHE_MAX_MB * 1024 * 1024
+)
+
+def variation_seed(requested=None):
+    """The requested seed, else one of READMEUP_RESULT_VARIANTS (None = uncached, fully random)."""
+    if requested is not None:
+        return int(requested)
+    return secrets.randbelow(config.RESULT_VARIANTS) if config.RESULT_VARIANTS > 0 else None
+
+# Maximum number of titles suggested for a Smart Match query
+TITLE_SUGGESTIONS = 100
+
+def render(template, **context):
+    """render_template, timed as the "render" stage."""
+    with METRICS.stage("render"):
+        return render_template(template, **context)
+
+@main.before_app_request
+def start_request_timer():
+    if METRICS.enabled:
+        g.request_start = time.perf_counter()
+        if config.SERVER_TIMING:
+            METRICS.begin_trace()
+
+@main.after_app_request
+def record_request(response):
+    """Request latency and status per endpoint, plus the Server-Timing header when enabled."""
+    start = g.pop("request_start", None)
+    if start is None or request.endpoint == "static":
+        return response
+    elapsed = time.perf_counter() - start
+    endpoint = request.endpoint or "unmatched"
+    METRICS.observe("request_seconds", elapsed, endpoint=endpoint)
+    METRICS.inc("requests_total", endpoint=endpoint, status=str(response.status_code))
+    if config.SERVER_TIMING:
+        response.headers["Server-Timing"] = server_timing(METRICS.end_trace(), elapsed)
+    return response
+
+@METRICS.collector
+def cache_metrics():
+    """Cache sizes and hit rates, warm-up load times and encoder batching, read at scrape time."""
+    caches = {"results": RESULT_CACHE.stats(), "quick_pages": QUICK_RESULTS.stats()}
+    encoder = None
+    if WARMUP.ready("embedder"):
+        encoder, query_cache = stage_value("embedder")
+        caches["query_embeddings"] = query_cache.stats()
+    for cache, stats in caches.items():
+        yield "cache_hits_total", "counter", "Cache hits", {"cache": cache}, stats["hits"]
+        yield "cache_misses_total", "counter", "Cache misses", {"cache": cache}, stats["misses"]
+        yield "cache_hit_ratio", "gauge", "Cache hits / lookups", {"cache": cache}, stats["hit_rate"]
+        yield "cache_entries", "gauge", "Entries held by the cache", {"cache": cache}, stats["size"]
+    for stage, status in WARMUP.status().items():
+        ready = status["state"] == "ready"
+        yield "warmup_ready", "gauge", "1 once the warm-up stage has loaded", {"stage": stage}, ready
+        if status["seconds"] is not None:
+            yield "warmup_seconds", "gauge", "Load time of the warm-up stage", {"stage": stage}, status["seconds"]
+    if isinstance(encoder, BatchingEncoder):
+        stats = encoder.stats()
+        yield "encoder_batches_total", "counter", "Encoder forward passes", {}, stats["batches"]
+        yield "encoder_sentences_total", "counter", "Queries encoded", {}, stats["sentences"]
+        yield "encoder_queue_depth", "gauge", "Encodings waiting for a batch", {}, encoder.backlog()
+
+@main.route("/debug/memory")
+def debug_memory():
+    """Memory held by each loaded warm-up stage and by the process, as JSON (READMEUP_MEMORY_REPORT=1)"""
+    if not config.MEMORY_REPORT:
+        return "The memory report is disabled (READMEUP_MEMORY_REPORT=0)", 404
+    loads = {name: {"seconds": status["seconds"]} for name, status in WARMUP.status().items()}
+    return jsonify(memory_report(WARMUP.values(), loads))
+
+@main.route("/metrics")
+def metrics():
+    """Prometheus metrics of this process (per-stage latency histograms, counters, cache hit rates)"""
+    if not METRICS.enabled:
+        return "Metrics are disabled (READMEUP_METRICS=0)", 404
+    return Response(METRICS.render(), mimetype="text/plain; version=0.0.4")
 
 @main.route("/")
 def index():
     """Home page with application overview"""
     return render_template("index.html")
 
+@main.route("/healthz")
+def healthz():
+    """Liveness, with the warm-up state and load time of every stage"""
+    return jsonify(status="ok", stages=WARMUP.status(), result_cache=RESULT_CACHE.stats())
+
+@main.route("/readyz")
+def readyz():
+    """Readiness of each mode; 503 until all of them can serve"""
+    modes = {mode: WARMUP.ready(*stages) for mode, stages in MODE_STAGES.items()}
+    ready = all(modes.values())
+    return jsonify(ready=ready, modes=modes, stages=WARMUP.status()), 200 if ready else 503
+
 @main.route("/quick-pick", methods=["GET", "POST"])
 def quick_pick():
     """Quick search with multiple filters and pagination"""
+    df_quick, genres, quick_index = stage_value("quick")
+
     if request.method == "POST":
         # Extract filter parameters
         title_kw = request.form.get("title_kw", "").strip()
@@ -41,26 +238,21 @@ def quick_pick():
         lang_kw = request.form.get("lang_kw", "")
         pub_kw = ""
 
-        # Apply filters
-        results = apply_multi_filter(df_quick, title_kw, author_kw, genre_kw, lang_kw, pub_kw)
-
-        # Apply sorting
         order_by = request.form.get("order_by", "rating (high to low)")
-        if order_by == "rating (high to low)":
-            results = results.sort_values(by="rating", ascending=False)
-        else:
-            results = sort_df_by_title_lns(results)
-
-        # Pagination logic
         page_size = int(request.form.get("page_size", 20))
         page = int(request.form.get("page", 1))
-        n_pages = max(1, int(np.ceil(len(results) / page_size)))
-        start = (page - 1) * page_size
-        end = start + page_size
+        cursor = request.form.get("cursor", "") if "page" in request.form else ""
+        page_ids, total, n_pages, cursor = quick_page(
+            df_quick, quick_index, (title_kw, author_kw, genre_kw, lang_kw, pub_kw), order_by, page, page_size, cursor
+        )
 
         # Prepare data for template
-        page_results = results.iloc[start:end].to_dict(orient="records")
-        total = len(results)
+        with METRICS.stage("quick.records"):
+            page_results = df_quick.iloc[page_ids].to_dict(orient="records")
+        with METRICS.stage("quick.facets"):
+            genre_counts, language_counts = quick_index.facet_counts(
+                title_kw, author_kw, genre_kw, lang_kw, pub_kw
+            )
 
         filters = {
             "title_kw": title_kw,
@@ -84,12 +276,17 @@ def quick_pick():
         page_size = 20
         n_pages = 1
         total = 0
+        cursor = ""
+        genre_counts, language_counts = quick_index.facet_counts()
 
-    return render_template("quick_pick.html",
-        genres=GENRES,
-        languages=sort_lns_iterable(df_quick["language"].unique()),
+    return render("quick_pick.html",
+        genres=genres,
+        languages=quick_index.languages.labels,
+        genre_counts=genre_counts,
+        language_counts=language_counts,
         results=page_results,
         total=total,
+        cursor=cursor,
         page=page,
         n_pages=n_pages,
         page_size=page_size,
@@ -101,6 +298,7 @@ def smart_match():
     """AI-powered book recommendations based on similarity"""
     book_query = request.form.get("book_query", "").strip().lower()
     selected_book = request.form.get("selected_book", "")
+    selected_id = request.form.get("selected_id", "")
     exclude_series = request.form.get("exclude_series") == "on"
     exclude_author = request.form.get("exclude_author") == "on"
     top_knn = int(request.form.get("top_knn", 5))
@@ -109,24 +307,32 @@ def smart_match():
     results = []
     message = ""
     
-    # Filter titles based on user input
+    df_smart, lookup = stage_value("smart")
+
+    # Suggest titles based on user input
     if book_query:
-        filtered_titles = df_smart[
-            df_smart["normalized_title"].str.contains(book_query)
-        ]["title"].tolist()
+        with METRICS.stage("smart.autocomplete"):
+            hits = lookup.titles.autocomplete(book_query, limit=TITLE_SUGGESTIONS)
+            filtered_titles = lookup.title_options(df_smart, hits)
 
     # Generate recommendations if a book is selected
-    if request.method == "POST" and selected_book:
+    if request.method == "POST" and (selected_id or selected_book):
+        embedding_matrix, vector_index = stage_value("vectors")
+        neighbor_table = stage_value("neighbors")
         results_df, message = knn_recommend(
             selected_book, exclude_series, exclude_author, top_knn,
-            df_smart, embedding_matrix, knn_model
+            df_smart, embedding_matrix, vector_index,
+            book_id=int(selected_id) if selected_id.isdigit() else None,
+            lookup=lookup, neighbor_table=neighbor_table, seed=variation_seed(), result_cache=RESULT_CACHE
         )
-        results = results_df.to_dict(orient="records")
+        with METRICS.stage("smart.records"):
+            results = results_df.to_dict(orient="records")
 
-    return render_template("smart_match.html",
+    return render("smart_match.html",
         book_query=book_query,
         filtered_titles=filtered_titles,
         selected_book=selected_book,
+        selected_id=selected_id,
         exclude_series=exclude_series,
         exclude_author=exclude_author,
         top_knn=top_knn,
@@ -134,6 +340,40 @@ def smart_match():
         message=message
     )
 
+def deep_retrieval(mode=None):
+    """
+    (mode, embedder, query_cache, vector_index, lexical_index) for a Deep Dive request.
+    Falls back to keyword-only search, which never calls the encoder, while the
+    encoder is still loading or has READMEUP_LEXICAL_FALLBACK_BACKLOG queries queued,
+    and from hybrid to vector-only search while the keyword index is unavailable.
+    """
+    mode = mode if mode in RETRIEVAL_MODES else config.DEEP_RETRIEVAL
+    if mode != "lexical" and (WARMUP.loading("embedder", "vectors") or _encoder_backlogged()):
+        mode = "lexical"
+    lexical_index = None
+    if mode == "hybrid":
+        # The vector search alone answers while the keyword index loads, or if it failed
+        if not WARMUP.loading("lexical"):
+            try:
+                lexical_index = stage_value("lexical")
+            except NotReady:
+                pass
+        if lexical_index is None:
+            mode = "semantic"
+    elif mode == "lexical":
+        lexical_index = stage_value("lexical")
+    if mode == "lexical":
+        return mode, None, None, None, lexical_index
+    embedder, query_cache = stage_value("embedder")
+    _, vector_index = stage_value("vectors")
+    return mode, embedder, query_cache, vector_index, lexical_index
+
+def _encoder_backlogged():
+    if not config.LEXICAL_FALLBACK_BACKLOG or not WARMUP.ready("embedder"):
+        return False
+    embedder, _ = stage_value("embedder")
+    return hasattr(embedder, "backlog") and embedder.backlog() >= config.LEXICAL_FALLBACK_BACKLOG
+
 @main.route("/deep-dive", methods=["GET", "POST"])
 def deep_dive():
     """Semantic search based on book descriptions"""
@@ -141,23 +381,30 @@ def deep_dive():
     language = request.form.get("language", "")
     min_rating = float(request.form.get("min_rating", 0.0))
     top_n = int(request.form.get("top_n", 5))
+    mode = request.form.get("mode", config.DEEP_RETRIEVAL)
 
     results = []
     message = ""
-    
+    df_deep, deep_filters = stage_value("deep")
+
     if request.method == "POST" and query:
+        used_mode, embedder, query_cache, vector_index, lexical_index = deep_retrieval(mode)
         results_df, message = semantic_recommend(
-            query, df_deep, embedder, faiss_index, top_n, language, min_rating
+            query, df_deep, embedder, vector_index, top_n, language, min_rating,
+            query_cache=query_cache, filters=deep_filters, seed=variation_seed(), result_cache=RESULT_CACHE,
+            lexical_index=lexical_index, mode=used_mode,
         )
         if results_df is not None:
-            results = results_df.to_dict(orient="records")
+            with METRICS.stage("deep.records"):
+                results = results_df.to_dict(orient="records")
 
-    return render_template("deep_dive.html",
+    return render("deep_dive.html",
         query=query,
         language=language,
         min_rating=min_rating,
         top_n=top_n,
+        mode=mode,
         results=results,
         message=message,
-        languages=sort_lns_iterable(df_deep["language"].unique())
-    )
\ No newline at end of file
+        languages=deep_filters.languages
+    )
@@ -0,0 +1,332 @@
+"""
+The book catalogue, read and normalized once and shared by every mode.
+
+    python -m app.models.catalogue   # (re)build the binary snapshot
+"""
+import argparse
+import ast
+import hashlib
+import json
+import os
+import time
+import warnings
+import zipfile
+import numpy as np
+import pandas as pd
+from functools import lru_cache
+from app.utils.language import lang_to_iso, iso_to_display
+from app.utils.sorting import lns_rank_positions, TITLE_RANK_COL
+from app.utils.files import atomic_write
+from app import config
+from app.config import DATA_PATH
+
+
+# Columns every view exposes under the same name, even when missing from the CSV
+EXPECTED_COLS = ["title", "author", "rating", "description", "genres", "language", "publisher", "coverImg"]
+
+# Per-mode column renames: view column -> catalogue column
+VIEW_COLUMNS = {
+    "quick": {},
+    "smart": {"author": "author_list", "genres": "genre_list", "rating": "rating_filled"},
+    "deep": {"author": "author_list", "genres": "genre_list", "rating": "rating_filled"},
+}
+# Alternate representations, only visible through a rename
+_ALTERNATE_COLS = {"author_list", "genre_list", "rating_filled"}
+
+
+def parse_list(value) -> list:
+    """A stringified list ("['a', 'b']") or a comma separated string as a list of stripped strings."""
+    if isinstance(value, list):
+        return value
+    if not isinstance(value, str) or not value.strip():
+        return []
+    if value.lstrip().startswith("["):
+        try:
+            parsed = ast.literal_eval(value)
+            return [str(v).strip() for v in parsed] if isinstance(parsed, (list, tuple)) else [str(parsed)]
+        except (ValueError, SyntaxError):
+            value = value.replace("[", "").replace("]", "").replace("'", "").replace('"', "")
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+
+def clean_genre_strings(genres: pd.Series) -> pd.Series:
+    """Genre lists flattened to "A, B" strings, as Quick Pick filters and shows them."""
+    return (
+        genres
+        .str.replace("[", "", regex=False)       # remove opening bracket
+        .str.replace("]", "", regex=False)       # remove closing bracket
+        .str.replace("'", "", regex=False)       # remove single quotes
+        .str.replace('"', "", regex=False)       # remove double quotes
+        .str.replace(";", ",")                   # unify separators
+        .str.replace("|", ",")
+        .str.replace("  ", " ")                  # collapse double spaces
+        .str.strip()
+    )
+
+
+class Catalogue:
+    """
+    All books with every column parsed once. A book's row id is its position in
+    the CSV, which is also its position in the embeddings and the vector index.
+    Each mode reads the catalogue through ``view``: a DataFrame built from the
+    catalogue's own column arrays, so views cost no copy and must not be
+    modified in place.
+    """
+
+    def __init__(self, df: pd.DataFrame, fingerprint: str | None = None):
+        self.df = df
+        self.fingerprint = fingerprint
+
+    def __len__(self):
+        return len(self.df)
+
+    @property
+    def row_ids(self) -> np.ndarray:
+        return np.arange(len(self.df))
+
+    def view(self, mode: str) -> pd.DataFrame:
+        """The catalogue with the column representations ``mode`` expects."""
+        renames = VIEW_COLUMNS[mode]
+        columns = {}
+        for col in self.df.columns:
+            if col in _ALTERNATE_COLS:
+                continue
+            columns[col] = self.df[renames.get(col, col)]
+        view = pd.DataFrame(columns, copy=False)
+        # Lets caches of results computed from this view notice a catalogue change
+        view.attrs["fingerprint"] = self.fingerprint
+        return view
+
+    def embedding_texts(self) -> pd.Series:
+        """Text the book embeddings are computed from (description plus genres)."""
+        return self.df["description"].str.strip() + ". Genres: " + self.df["genre_list"].str.join(", ")
+
+
+@lru_cache(maxsize=1)
+def load_catalogue(csv_path: str = DATA_PATH) -> Catalogue:
+    """
+    The catalogue from its snapshot when the fingerprint of the CSV and the
+    embeddings matches, otherwise parsed from the CSV and snapshotted again.
+    """
+    if not os.path.exists(csv_path):
+        raise FileNotFoundError(f"CSV not found at {csv_path}")
+    sources = source_stats(csv_path)
+    key = snapshot_key(csv_path, sources)
+    if not config.CATALOGUE_SNAPSHOT:
+        return Catalogue(read_csv(csv_path), key)
+
+    path = snapshot_path(csv_path)
+    df = load_snapshot(path, key)
+    # Rewritten as well when the files only got a new mtime (copied, touched), so the next start skips hashing
+    if df is None or (_snapshot_meta(path) or {}).get("sources") != sources:
+        df = read_csv(csv_path) if df is None else df
+        try:
+            save_snapshot(df, path, key, sources)
+        except (OSError, ValueError) as exc:
+            warnings.warn(f"Could not write the catalogue snapshot {path}: {exc}")
+    return Catalogue(df, key)
+
+
+def read_csv(csv_path: str) -> pd.DataFrame:
+    """Parses and normalizes the catalogue CSV (the slow path the snapshot replaces)."""
+    df = pd.read_csv(csv_path)
+    df = df.drop(columns=["Unnamed: 0"], errors="ignore").reset_index(drop=True)
+
+    # Ensure all expected columns exist
+    for col in EXPECTED_COLS:
+        if col not in df.columns:
+            df[col] = np.nan
+
+    # Ratings: unrated books stay NaN for sorting, and read as 0.0 where a number is needed
+    df["rating"] = pd.to_numeric(df["rating"], errors="coerce")
+    df["rating_filled"] = df["rating"].fillna(0.0)
+
+    # Fill missing values and convert to string
+    for col in ["title", "author", "description", "genres", "language", "publisher", "coverImg"]:
+        df[col] = df[col].fillna("").astype(str)
+
+    # Authors and genres as lists, and genres as a flat string
+    df["author_list"] = df["author"].map(parse_list)
+    df["genre_list"] = df["genres"].map(parse_list)
+    df["genres"] = clean_genre_strings(df["genres"])
+
+    # Normalize language codes, once per distinct value
+    df["language_raw"] = df["language"]
+    df["language_code"] = df["language_raw"].map({v: lang_to_iso(v) for v in df["language_raw"].unique()})
+    df["language"] = df["language_code"].map({v: iso_to_display(v) for v in df["language_code"].unique()})
+
+    # Title lookups and title sorting
+    df["normalized_title"] = df["title"].str.lower().str.strip()
+    df[TITLE_RANK_COL] = lns_rank_positions(df["title"])
+
+    return df
+
+
+# Binary snapshot: one .npz holding every column as NumPy arrays. Strings are
+# dictionary-coded, their distinct values kept as one NUL-joined UTF-8 buffer, and
+# lists as flattened values plus row offsets, so loading is a few splits. Nothing
+# is pickled: the file is read back without allow_pickle. It is read into each
+# process, not mapped: string columns are Python objects, which pre-forked
+# workers share only copy-on-write.
+
+# Bump when the normalization in read_csv changes, to invalidate old snapshots
+SNAPSHOT_VERSION = 1
+EMBEDDINGS_FILE = "embeddings.npy"
+_LIST_COLS = {"author_list", "genre_list"}
+_SEP = "\x00"
+
+
+def snapshot_path(csv_path: str) -> str:
+    return os.path.splitext(csv_path)[0] + ".snapshot.npz"
+
+
+def _sources(csv_path: str) -> tuple:
+    return csv_path, os.path.join(os.path.dirname(csv_path), EMBEDDINGS_FILE)
+
+
+def source_stats(csv_path: str) -> dict:
+    """Size and mtime of the CSV and of the embeddings next to it (None when missing)."""
+    stats = {}
+    for path in _sources(csv_path):
+        try:
+            st = os.stat(path)
+            stats[os.path.basename(path)] = [st.st_size, st.st_mtime_ns]
+        except OSError:
+            stats[os.path.basename(path)] = None
+    return stats
+
+
+def snapshot_key(csv_path: str, sources: dict | None = None) -> str:
+    """
+    Fingerprint of the CSV and of the embeddings next to it, whose rows the ids
+    must match. Hashing reads both files in full, so the fingerprint recorded in
+    the snapshot is reused while their size and mtime (``sources``) are unchanged.
+    """
+    sources = sources if sources is not None else source_stats(csv_path)
+    meta = _snapshot_meta(snapshot_path(csv_path))
+    if meta is not None and meta.get("version") == SNAPSHOT_VERSION and meta.get("sources") == sources:
+        return meta["fingerprint"]
+    return fingerprint(*_sources(csv_path))
+
+
+def fingerprint(*paths) -> str:
+    """Content hash of the given files (missing files hash as absent) and the snapshot format."""
+    digest = hashlib.blake2b(f"v{SNAPSHOT_VERSION}".encode(), digest_size=16)
+    for path in paths:
+        digest.update(os.path.basename(path).encode())
+        if not os.path.exists(path):
+            digest.update(b"<missing>")
+            continue
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _pack_strings(values) -> np.ndarray:
+    return np.frombuffer(_SEP.join(values).encode("utf-8"), dtype=np.uint8)
+
+
+def _unpack_strings(buffer: np.ndarray, n: int) -> list:
+    return buffer.tobytes().decode("utf-8").split(_SEP) if n else []
+
+
+def save_snapshot(df: pd.DataFrame, path: str, key: str, sources: dict | None = None):
+    arrays, columns = {}, []
+    for i, name in enumerate(df.columns):
+        col, prefix = df[name], f"c{i}"
+        values = col.to_numpy()
+        if col.dtype.kind in "biuf":
+            kind = "numeric"
+            arrays[prefix] = values
+        elif name in _LIST_COLS:
+            kind = "list"
+            flat = [v for items in values for v in items]
+            arrays[prefix] = _pack_strings(flat)
+            arrays[prefix + "_offsets"] = np.concatenate(([0], np.cumsum([len(v) for v in values]))).astype(np.int64)
+            arrays[prefix + "_n"] = np.array(len(flat))
+        elif all(isinstance(v, str) and _SEP not in v for v in values if not pd.isna(v)):
+            kind = "string"
+            codes, uniques = pd.factorize(col, use_na_sentinel=True)
+            arrays[prefix] = codes.astype(np.int32)
+            arrays[prefix + "_uniques"] = _pack_strings(uniques)
+            arrays[prefix + "_n"] = np.array(len(uniques))
+        else:
+            # Mixed-type column; never expected from the cleaned CSV, and it would need pickling
+            raise ValueError(f"column {name!r} holds values that are not strings")
+        columns.append({"name": name, "kind": kind})
+
+    meta = {"version": SNAPSHOT_VERSION, "fingerprint": key, "sources": sources, "rows": len(df), "columns": columns}
+    arrays["meta"] = np.array(json.dumps(meta))
+    with atomic_write(path) as f:
+        np.savez(f, **arrays)
+
+
+def load_snapshot(path: str, key: str):
+    """
+    The snapshotted DataFrame, or None if there is none, it was built from
+    other files or it cannot be read (truncated, corrupt or an older format).
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        return _read_snapshot(path, key)
+    except (OSError, ValueError, KeyError, IndexError, EOFError, zipfile.BadZipFile) as exc:
+        warnings.warn(f"Ignoring unreadable catalogue snapshot {path}: {exc!r}")
+        return None
+
+
+def _snapshot_meta(path: str):
+    """The metadata of the snapshot at ``path``, or None (only that member is read)."""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "rb") as f, np.load(f, allow_pickle=False) as snapshot:
+            return json.loads(str(snapshot["meta"]))
+    except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+        return None
+
+
+def _read_snapshot(path: str, key: str):
+    with open(path, "rb") as f, np.load(f, allow_pickle=False) as snapshot:
+        meta = json.loads(str(snapshot["meta"]))
+        if meta["fingerprint"] != key:
+            return None
+        columns = {}
+        for i, spec in enumerate(meta["columns"]):
+            prefix, kind = f"c{i}", spec["kind"]
+            if kind == "numeric":
+                values = snapshot[prefix]
+            elif kind == "list":
+                flat = _unpack_strings(snapshot[prefix], int(snapshot[prefix + "_n"]))
+                offsets = snapshot[prefix + "_offsets"].tolist()
+                values = [flat[a:b] for a, b in zip(offsets[:-1], offsets[1:])]
+            else:
+                uniques = np.array(_unpack_strings(snapshot[prefix + "_uniques"], int(snapshot[prefix + "_n"])) + [np.nan],
+                                   dtype=object)
+                values = uniques[snapshot[prefix]]  # code -1 (missing) picks the trailing NaN
+            if len(values) != meta["rows"]:
+                raise ValueError(f"column {spec['name']!r} has {len(values)} rows, expected {meta['rows']}")
+            columns[spec["name"]] = values
+    return pd.DataFrame(columns)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the binary catalogue snapshot from the CSV.")
+    parser.add_argument("--csv", default=DATA_PATH)
+    args = parser.parse_args()
+
+    sources = source_stats(args.csv)
+    start = time.perf_counter()
+    df = read_csv(args.csv)
+    parsed = time.perf_counter() - start
+    path, key = snapshot_path(args.csv), fingerprint(*_sources(args.csv))
+    save_snapshot(df, path, key, sources)
+    start = time.perf_counter()
+    load_snapshot(path, key)
+    print(f"{len(df):,} books -> {path} ({os.path.getsize(path) / 1e6:.1f} MB); "
+          f"CSV parse {parsed:.2f}s, snapshot load {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,89 +1,250 @@
 import os
-import ast
+import warnings
 import faiss
 import numpy as np
-import pandas as pd
 from functools import lru_cache
-from sentence_transformers import SentenceTransformer
-from app.utils.language import lang_to_iso, iso_to_display  
+from app.utils.sorting import sort_lns_iterable
+from app.utils.vector_index import FaissVectorIndex
+from app.utils.bm25 import BM25Index, reciprocal_rank_fusion
+from app.utils.metrics import METRICS
+from app.models.index_builder import index_path, configure_index
+from app.models.catalogue import load_catalogue
+from app import config
+from app.config import DATA_PATH, EMB_PATH
 
-# Paths and model setup
-DATA_PATH = "data/final/books_translated.csv"
+# Model setup
 MODEL_PATH = "sentence-transformers/all-MiniLM-L6-v2"
-IDX_PATH = "data/final/faiss_index.idx"
-EMB_PATH = "data/final/embeddings.npy"
+
+# Deep Dive retrieval: dense vectors, BM25 keywords, or both fused
+RETRIEVAL_MODES = ("semantic", "lexical", "hybrid")
+# What the "score" of a result is in each mode (higher is better in all three)
+SCORE_KINDS = {"semantic": "cosine", "lexical": "bm25", "hybrid": "rrf"}
 
 @lru_cache(maxsize=1)
 def load_dataset():
-    """Load and preprocess the translated books dataset."""
-    df = pd.read_csv(DATA_PATH)
-    df = df.drop(columns=['Unnamed: 0'], errors='ignore')
-
-    # Parse genres if stored as stringified lists
-    if isinstance(df['genres'].iloc[0], str) and df['genres'].iloc[0].startswith("["):
-        df['genres'] = df['genres'].apply(ast.literal_eval)
-
-    # Normalize author field
-    df['author'] = df['author'].apply(
-        lambda x: [a.strip() for a in x.split(',')] if isinstance(x, str)
-        else (x if isinstance(x, list) else [])
-    )
-
-    # Clean and normalize text fields
-    df['description'] = df['description'].fillna("").astype(str)
-    df['language'] = df['language'].fillna("").astype(str)
-    df['language_code'] = df['language'].apply(lang_to_iso)
-    df['language'] = df['language_code'].apply(iso_to_display)
-    df['rating'] = pd.to_numeric(df['rating'], errors='coerce').fillna(0.0)
-    df['genres'] = df['genres'].apply(lambda g: g if isinstance(g, list) else [])
-
-    # Create embedding input text
-    df['text_for_embedding'] = df['description'].str.strip() + ". Genres: " + df['genres'].apply(lambda g: ", ".join(g))
-    return df
+    """Deep Dive view of the shared catalogue: authors and genres as lists, ratings filled with 0."""
+    return load_catalogue(DATA_PATH).view("deep")
+
+class SearchFilters:
+    """Row sets for the Deep Dive language and rating filters, precomputed once per dataset."""
+
+    def __init__(self, df):
+        self.n_rows = len(df)
+        self.ratings = df['rating'].to_numpy(dtype=float)
+        self.code_rows = df['language_code'].str.lower().groupby(df['language_code'].str.lower()).indices
+        self.name_rows = df['language'].str.casefold().groupby(df['language'].str.casefold()).indices
+        self.languages = sort_lns_iterable(df['language'].unique())
+
+    def mask(self, language=None, min_rating=0.0):
+        """Boolean mask of the rows passing the filters, or None when nothing is filtered."""
+        mask = None
+        if language:
+            lang_str = str(language).strip()
+            mask = np.zeros(self.n_rows, dtype=bool)
+            mask[self.code_rows.get(lang_str.lower(), [])] = True
+            mask[self.name_rows.get(lang_str.casefold(), [])] = True
+        if min_rating and min_rating > 0:
+            rated = self.ratings >= float(min_rating)
+            mask = rated if mask is None else mask & rated
+        return mask
+
+def build_lexical_index(df):
+    """BM25 index over the title, genres and description of every book."""
+    texts = df['title'].astype(str) + " " + df['genres'].str.join(" ") + " " + df['description'].astype(str)
+    return BM25Index(texts.tolist())
 
 @lru_cache(maxsize=1)
 def load_embedder():
-    """Load the sentence transformer model from local path."""
+    """Load the query embedder for the configured backend (torch, onnx or stub)."""
+    if config.EMBEDDER_BACKEND == "stub":
+        from app.utils.stub_embedder import StubEmbedder
+        return StubEmbedder(config.STUB_EMBEDDER_DIM)
+    if config.EMBEDDER_BACKEND == "onnx":
+        from app.utils.onnx_embedder import OnnxEmbedder
+        return OnnxEmbedder(config.ONNX_MODEL_PATH, MODEL_PATH, threads=config.ONNX_THREADS)
+    from sentence_transformers import SentenceTransformer
     return SentenceTransformer(MODEL_PATH)
 
 @lru_cache(maxsize=1)
 def load_faiss_artifacts():
-    """Load FAISS index and embedding matrix if available."""
-    if os.path.exists(IDX_PATH) and os.path.exists(EMB_PATH):
-        return faiss.read_index(IDX_PATH), np.load(EMB_PATH)
+    """Load the configured FAISS index type and embedding matrix if available."""
+    idx_path = index_path(config.INDEX_TYPE)
+    if not os.path.exists(idx_path):
+        if config.INDEX_TYPE != "flat":
+            warnings.warn(f"{idx_path} not found, falling back to the flat index")
+        idx_path = index_path("flat")
+    if os.path.exists(idx_path) and os.path.exists(EMB_PATH):
+        index = read_index(idx_path)
+        return configure_index(index, config.INDEX_NPROBE, config.INDEX_EF_SEARCH), load_embeddings()
     return None, None
 
-def semantic_recommend(query, df, embedder, faiss_index, top_n=5, language=None, min_rating=0.0):
+def load_embeddings(path=EMB_PATH):
+    """The embedding matrix, memory-mapped read-only when READMEUP_MMAP is set."""
+    return np.load(path, mmap_mode="r" if config.MMAP_ARTIFACTS else None)
+
+def read_index(path):
+    """Reads a FAISS index, memory-mapped read-only when READMEUP_MMAP is set and FAISS supports it."""
+    if config.MMAP_ARTIFACTS:
+        # IO_FLAG_MMAP_IFC also maps flat codes; older FAISS only maps inverted lists
+        flags = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+        try:
+            return faiss.read_index(path, flags)
+        except RuntimeError as exc:
+            warnings.warn(f"Cannot memory-map {path} ({exc}), reading it into memory")
+    return faiss.read_index(path)
+
+def encode_query(embedder, query):
+    """Encode a query into a unit-length float32 row vector."""
+    q_vec = embedder.encode([query], convert_to_numpy=True).astype('float32')
+    q_vec /= np.clip(np.linalg.norm(q_vec, axis=1, keepdims=True), 1e-12, None)
+    return q_vec
+
+def encode_queries(embedder, queries, query_cache=None):
+    """Unit-length vectors for ``queries``, encoding every cache miss in a single pass."""
+    vectors = [query_cache.get(q) if query_cache is not None else None for q in queries]
+    misses = [i for i, vec in enumerate(vectors) if vec is None]
+    if misses:
+        texts = list(dict.fromkeys(queries[i] for i in misses))
+        encoded = embedder.encode(texts, convert_to_numpy=True).astype('float32')
+        encoded /= np.clip(np.linalg.norm(encoded, axis=1, keepdims=True), 1e-12, None)
+        by_text = {text: vec[None, :] for text, vec in zip(texts, encoded)}
+        for i in misses:
+            vectors[i] = by_text[queries[i]]
+        if query_cache is not None:
+            for text, vec in by_text.items():
+                query_cache.put(text, vec)
+    return np.vstack(vectors)
+
+def semantic_recommend(query, df, embedder, faiss_index, top_n=5, language=None, min_rating=0.0, query_cache=None,
+                       filters=None, seed=None, result_cache=None, lexical_index=None, mode=None):
     """Return top semantic recommendations based on query and filters, with variation on each call."""
     if not query or not query.strip():
         return None, "Please enter a description or idea for the book you want."
+    return semantic_recommend_batch(
+        [{"query": query, "language": language, "min_rating": min_rating, "top_n": top_n}],
+        df, embedder, faiss_index, query_cache=query_cache, filters=filters, seed=seed, result_cache=result_cache,
+        lexical_index=lexical_index, mode=mode,
+    )[0]
 
-    # Encode query and normalize vector
-    q_vec = embedder.encode([query], convert_to_numpy=True).astype('float32')
-    q_vec /= np.clip(np.linalg.norm(q_vec, axis=1, keepdims=True), 1e-12, None)
+def semantic_recommend_batch(requests, df, embedder, faiss_index, query_cache=None, filters=None, seed=None,
+                             result_cache=None, lexical_index=None, mode=None):
+    """
+    ``semantic_recommend`` for many queries at once: one encoding pass for all
+    of them and one multi-query search per distinct (language, min_rating)
+    filter. ``requests`` are dicts with ``query`` and optional ``language``,
+    ``min_rating``, ``top_n``, ``seed`` and ``mode``; returns a (results, message) pair for each.
+    With a seed the random pick is reproducible, and so cacheable in ``result_cache``.
+
+    Modes (see RETRIEVAL_MODES): "semantic" searches the vector index only,
+    "lexical" the BM25 ``lexical_index`` only (no encoder call at all), and
+    "hybrid" fuses both rankings with reciprocal-rank fusion. The default is
+    hybrid when a lexical index is given. Results carry a "score" column, of
+    the kind SCORE_KINDS gives for the mode.
+    """
+    if not hasattr(faiss_index, "search_filtered"):
+        faiss_index = FaissVectorIndex(faiss_index)
+    filters = filters if filters is not None else SearchFilters(df)
+    default_mode = mode or ("hybrid" if lexical_index is not None else "semantic")
+    outputs = [(None, "Please enter a description or idea for the book you want.")] * len(requests)
+    fingerprint = df.attrs.get("fingerprint")
+
+    # Normalized requests; repeated ones come straight from the cache
+    todo = {}
+    for i, r in enumerate(requests):
+        query = str(r.get("query") or "")
+        if not query.strip():
+            continue
+        req = {
+            "query": query,
+            "language": str(r.get("language") or "").strip() or None,
+            "min_rating": float(r.get("min_rating") or 0.0),
+            "top_n": int(r.get("top_n") or 5),
+            "seed": r.get("seed", seed),
+            "mode": r.get("mode") or default_mode,
+        }
+        if req["mode"] not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode {req['mode']!r}; expected one of {RETRIEVAL_MODES}")
+        if req["mode"] != "semantic" and lexical_index is None:
+            req["mode"] = "semantic"
+        req["key"] = ("deep", " ".join(query.split()).lower(), req["language"] and req["language"].casefold(),
+                      req["min_rating"], req["top_n"], req["seed"], req["mode"])
+        req["cacheable"] = result_cache is not None and req["seed"] is not None
+        cached = result_cache.get(req["key"], fingerprint) if req["cacheable"] else None
+        if cached is not None:
+            outputs[i] = _semantic_results(df, *cached)
+        else:
+            todo[i] = req
+    if not todo:
+        return outputs
+
+    # Encode queries and normalize vectors (reusing cached vectors for repeated queries)
+    dense = [i for i, req in todo.items() if req["mode"] != "lexical"]
+    q_vecs = {}
+    if dense:
+        with METRICS.stage("deep.encode"):
+            q_vecs = dict(zip(dense, encode_queries(embedder, [todo[i]["query"] for i in dense], query_cache)))
+
+    # Group queries by filter, so each group is a single (filtered) index search
+    groups = {}
+    for i, req in todo.items():
+        groups.setdefault((req["language"], req["min_rating"]), []).append(i)
+
+    for (language, min_rating), members in groups.items():
+        with METRICS.stage("deep.filter"):
+            allowed = filters.mask(language, min_rating)
+        # Use a larger pool to allow variation, filtering inside the search
+        # so selective filters still fill the pool whenever enough books match
+        pool_n = max(max(todo[i]["top_n"] * 5, todo[i]["top_n"] + 10) for i in members)
+        rankings = {i: [] for i in members}
+
+        group_dense = [i for i in members if todo[i]["mode"] != "lexical"]
+        if group_dense:
+            queries = np.vstack([q_vecs[i] for i in group_dense])
+            with METRICS.stage("deep.vector_search"):
+                if allowed is None:
+                    sims, idxs = faiss_index.search(queries, pool_n)
+                else:
+                    sims, idxs = faiss_index.search_filtered(queries, pool_n, allowed)
+            for row, i in enumerate(group_dense):
+                rankings[i].append((idxs[row], sims[row]))
+
+        group_lexical = [i for i in members if todo[i]["mode"] != "semantic"]
+        if group_lexical:
+            with METRICS.stage("deep.lexical_search"):
+                scores, ids = lexical_index.search([todo[i]["query"] for i in group_lexical], pool_n, allowed)
+            for row, i in enumerate(group_lexical):
+                rankings[i].append((ids[row], scores[row]))
+
+        with METRICS.stage("deep.select"):
+            for i in members:
+                req, n = todo[i], todo[i]["top_n"]
+                pool = max(n * 5, n + 10)
+                if len(rankings[i]) == 1:
+                    ids, scores = rankings[i][0]
+                    hits = ids >= 0
+                    ids, scores = ids[hits][:pool], scores[hits][:pool]
+                else:
+                    ids, scores = reciprocal_rank_fusion([ranked for ranked, _ in rankings[i]], limit=pool)
+
+                # Sample to introduce variation across calls while keeping relevance
+                if len(ids) >= n:
+                    pick = np.random.default_rng(req["seed"]).choice(len(ids), size=n, replace=False)
+                    ids, scores = ids[pick], scores[pick]
+                if req["mode"] == "semantic" and len(ids):
+                    # Index scores are distances in the index metric; report cosine similarity instead
+                    scores = faiss_index.cosine(q_vecs[i], ids)
+                message = f"Semantic recommendations for: **{req['query'].strip()}**"
+                if len(ids) == 0:
+                    message = "No results found. Try broadening your query or relaxing filters."
+                if req["cacheable"]:
+                    result_cache.put(req["key"], ids, scores, message, fingerprint)
+                outputs[i] = _semantic_results(df, ids, scores, message)
+    return outputs
 
-    # Search FAISS index (use a larger pool to allow variation)
-    pool_n = max(top_n * 5, top_n + 10)
-    sims, idxs = faiss_index.search(q_vec, pool_n)
-    candidates = df.iloc[idxs[0]].copy()
-    candidates['similarity'] = sims[0]
-
-    # Apply filters
-    if language:
-        lang_str = str(language).strip()
-        candidates = candidates[
-            candidates['language_code'].str.lower().eq(lang_str.lower()) |
-            candidates['language'].str.casefold().eq(lang_str.casefold())
-        ]
-    if min_rating and min_rating > 0:
-        candidates = candidates[candidates['rating'] >= float(min_rating)]
-
-    # Sample to introduce variation across calls while keeping relevance
-    if len(candidates) >= top_n:
-        results = candidates.sample(n=top_n, replace=False)
-    else:
-        results = candidates.head(top_n)
-
-    if results.empty:
-        return None, "No results found. Try broadening your query or relaxing filters."
-    return results, f"Semantic recommendations for: **{query.strip()}**"
+def _semantic_results(df, ids, scores, message):
+    """Result rows with their "score" (cosine similarity, BM25 score or fused RRF score by mode)."""
+    if len(ids) == 0:
+        return None, message
+    results = df.iloc[ids].copy()
+    results['score'] = scores
+    return results, message
@@ -0,0 +1,89 @@
+"""
+Export the Deep Dive query embedder to ONNX, optionally int8 dynamic-quantized.
+
+    python -m app.models.export_onnx [--quantize]
+
+The export is checked against the PyTorch SentenceTransformer on sample queries.
+Expected cosine similarity to the torch vectors: >= 0.9999 for fp32 and >= 0.98
+for int8 (ONNX_COSINE_TOLERANCE). Serve it with READMEUP_EMBEDDER_BACKEND=onnx.
+"""
+import argparse
+import numpy as np
+
+MODEL_PATH = "sentence-transformers/all-MiniLM-L6-v2"
+ONNX_PATH = "data/final/minilm.onnx"
+ONNX_INT8_PATH = "data/final/minilm-int8.onnx"
+
+# Minimum cosine similarity between ONNX and torch vectors for the same text
+ONNX_COSINE_TOLERANCE = {"fp32": 0.9999, "int8": 0.98}
+
+SAMPLE_QUERIES = [
+    "I want to read a fantasy book with a female hero, magic and dragons",
+    "A cozy mystery in a small English village",
+    "Hard science fiction about first contact",
+    "Historical romance set in Victorian London",
+    "Una novela sobre la guerra civil española",
+    "Dark psychological thriller with an unreliable narrator",
+    "Poetry",
+    "books like harry potter",
+]
+
+
+def export(model_name: str, out_path: str, opset: int = 14):
+    """Exports the transformer (token embeddings output) with dynamic batch and sequence axes."""
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name).eval()
+    sample = tokenizer(SAMPLE_QUERIES[:2], padding=True, return_tensors="pt")
+    inputs = ("input_ids", "attention_mask", "token_type_ids")
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in inputs}
+    dynamic_axes["token_embeddings"] = {0: "batch", 1: "sequence"}
+
+    with torch.no_grad():
+        torch.onnx.export(
+            model, tuple(sample[name] for name in inputs), out_path,
+            input_names=list(inputs), output_names=["token_embeddings"],
+            dynamic_axes=dynamic_axes, opset_version=opset,
+        )
+
+
+def quantize(fp32_path: str, int8_path: str):
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+
+
+def check(onnx_path: str, model_name: str, tolerance: float) -> float:
+    """Lowest cosine similarity between ONNX and torch vectors over the sample queries."""
+    from sentence_transformers import SentenceTransformer
+    from app.utils.onnx_embedder import OnnxEmbedder
+
+    reference = SentenceTransformer(model_name).encode(SAMPLE_QUERIES, convert_to_numpy=True)
+    reference /= np.linalg.norm(reference, axis=1, keepdims=True)
+    vectors = OnnxEmbedder(onnx_path, model_name).encode(SAMPLE_QUERIES)
+    worst = float((reference * vectors).sum(axis=1).min())
+    status = "ok" if worst >= tolerance else f"BELOW tolerance {tolerance}"
+    print(f"{onnx_path}: min cosine vs torch = {worst:.5f} ({status})")
+    return worst
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the query embedder to ONNX.")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--out", default=ONNX_PATH)
+    parser.add_argument("--quantize", action="store_true", help="also write an int8 dynamic-quantized copy")
+    parser.add_argument("--int8-out", default=ONNX_INT8_PATH)
+    args = parser.parse_args()
+
+    export(args.model, args.out)
+    ok = check(args.out, args.model, ONNX_COSINE_TOLERANCE["fp32"]) >= ONNX_COSINE_TOLERANCE["fp32"]
+    if args.quantize:
+        quantize(args.out, args.int8_out)
+        ok &= check(args.int8_out, args.model, ONNX_COSINE_TOLERANCE["int8"]) >= ONNX_COSINE_TOLERANCE["int8"]
+    if not ok:
+        raise SystemExit("ONNX export outside the cosine tolerance")
+
+
+if __name__ == "__main__":
+    main()
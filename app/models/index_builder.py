@@ -0,0 +1,103 @@
+"""
+Offline builder for the Deep Dive / Smart Match FAISS indexes.
+
+    python -m app.models.index_builder --type flat ivf hnsw ivfpq
+
+The type served at runtime is chosen with READMEUP_INDEX_TYPE (default: flat).
+"""
+import argparse
+import os
+import time
+import faiss
+import numpy as np
+from app.config import EMB_PATH
+
+INDEX_TYPES = ("flat", "ivf", "hnsw", "ivfpq")
+
+
+def index_path(index_type: str, embeddings_path: str = EMB_PATH) -> str:
+    """
+    File holding an index of ``index_type`` built from ``embeddings_path``, next to
+    it; the flat index keeps its historical name.
+    """
+    name = "faiss_index.idx" if index_type == "flat" else f"faiss_index_{index_type}.idx"
+    return os.path.join(os.path.dirname(embeddings_path), name)
+
+
+def default_nlist(n_vectors: int) -> int:
+    """Roughly 4 * sqrt(n) inverted lists, keeping at least 39 training points per list."""
+    return int(max(1, min(4 * np.sqrt(n_vectors), n_vectors // 39)))
+
+
+def build_index(embeddings: np.ndarray, index_type: str = "flat", nlist: int | None = None, nprobe: int = 16,
+                hnsw_m: int = 32, ef_construction: int = 200, ef_search: int = 128,
+                pq_m: int = 48, pq_bits: int = 8, train_size: int = 100_000, seed: int = 0):
+    """Builds an L2 index of ``index_type`` over ``embeddings`` (unit vectors, so L2 ranks like cosine)."""
+    embeddings = np.ascontiguousarray(embeddings, dtype="float32")
+    n, dim = embeddings.shape
+
+    if index_type == "flat":
+        index = faiss.IndexFlatL2(dim)
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, hnsw_m)
+        index.hnsw.efConstruction = ef_construction
+        index.hnsw.efSearch = ef_search
+    elif index_type in ("ivf", "ivfpq"):
+        nlist = nlist or default_nlist(n)
+        quantizer = faiss.IndexFlatL2(dim)
+        if index_type == "ivf":
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist)
+        else:
+            if dim % pq_m:
+                raise ValueError(f"pq_m={pq_m} must divide the embedding dimension {dim}")
+            index = faiss.IndexIVFPQ(quantizer, dim, nlist, pq_m, pq_bits)
+        sample = embeddings
+        if n > train_size:
+            sample = embeddings[np.random.default_rng(seed).choice(n, train_size, replace=False)]
+        index.train(sample)
+        index.nprobe = nprobe
+    else:
+        raise ValueError(f"Unknown index type {index_type!r}; expected one of {INDEX_TYPES}")
+
+    index.add(embeddings)
+    return index
+
+
+def configure_index(index, nprobe: int | None = None, ef_search: int | None = None):
+    """Applies search-time settings to a loaded index."""
+    inner = faiss.downcast_index(index)
+    if nprobe and isinstance(inner, faiss.IndexIVF):
+        inner.nprobe = nprobe
+    if ef_search and isinstance(inner, faiss.IndexHNSW):
+        inner.hnsw.efSearch = ef_search
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build FAISS indexes from the book embeddings.")
+    parser.add_argument("--type", nargs="+", default=["flat"], choices=INDEX_TYPES)
+    parser.add_argument("--embeddings", default=EMB_PATH)
+    parser.add_argument("--nlist", type=int, default=None, help="IVF lists (default ~4*sqrt(n))")
+    parser.add_argument("--nprobe", type=int, default=16)
+    parser.add_argument("--hnsw-m", type=int, default=32)
+    parser.add_argument("--ef-construction", type=int, default=200)
+    parser.add_argument("--ef-search", type=int, default=128)
+    parser.add_argument("--pq-m", type=int, default=48, help="PQ sub-quantizers (must divide the dimension)")
+    parser.add_argument("--pq-bits", type=int, default=8)
+    args = parser.parse_args()
+
+    embeddings = np.load(args.embeddings)
+    for index_type in args.type:
+        start = time.perf_counter()
+        index = build_index(
+            embeddings, index_type, nlist=args.nlist, nprobe=args.nprobe, hnsw_m=args.hnsw_m,
+            ef_construction=args.ef_construction, ef_search=args.ef_search, pq_m=args.pq_m, pq_bits=args.pq_bits,
+        )
+        path = index_path(index_type, args.embeddings)
+        faiss.write_index(index, path)
+        print(f"{index_type:<6} {index.ntotal:,} vectors -> {path} "
+              f"in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
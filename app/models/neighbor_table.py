@@ -0,0 +1,134 @@
+"""
+Precomputed item-to-item neighbor table for Smart Match.
+
+Build it offline once the embeddings change:
+    python -m app.models.neighbor_table --k 200 --jobs -1
+
+The table records the catalogue fingerprint it was built for, and is ignored
+(Smart Match falls back to live kNN) once the catalogue or embeddings change.
+"""
+import argparse
+import json
+import os
+import time
+import warnings
+import numpy as np
+from functools import lru_cache
+from joblib import Parallel, delayed
+from app.models.catalogue import snapshot_key
+from app.config import DATA_PATH, EMB_PATH, NEIGHBOR_IDS_PATH, NEIGHBOR_SIMS_PATH
+
+
+class NeighborTable:
+    """Top-K neighbor ids (int32) and cosine similarities (float16) per book, usually memory-mapped."""
+
+    def __init__(self, ids: np.ndarray, sims: np.ndarray):
+        self.ids = ids
+        self.sims = sims
+
+    def __len__(self):
+        return self.ids.shape[0]
+
+    @property
+    def k(self) -> int:
+        return self.ids.shape[1]
+
+    def get(self, row_id: int):
+        """Neighbor ids of ``row_id`` by decreasing similarity, or None if the book is not in the table."""
+        if not 0 <= row_id < len(self):
+            return None
+        row = np.asarray(self.ids[row_id])
+        return row[row >= 0]
+
+
+def _top_k_block(embeddings, start, stop, k):
+    """Exact top-k cosine neighbors (self excluded) for rows [start, stop)."""
+    sims = embeddings[start:stop] @ embeddings.T
+    sims[np.arange(stop - start), np.arange(start, stop)] = -np.inf
+    k = min(k, embeddings.shape[0] - 1)
+    top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+    top_sims = np.take_along_axis(sims, top, axis=1)
+    order = np.argsort(-top_sims, axis=1, kind="stable")
+    return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_sims, order, axis=1)
+
+
+def build_neighbor_table(embeddings: np.ndarray, k: int = 200, n_jobs: int = -1, block_size: int = 512) -> NeighborTable:
+    """Computes the exact top-``k`` neighbors of every book, in parallel over row blocks."""
+    embeddings = np.asarray(embeddings, dtype="float32")
+    embeddings = embeddings / np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+    n = embeddings.shape[0]
+
+    blocks = [(start, min(start + block_size, n)) for start in range(0, n, block_size)]
+    # Matrix products release the GIL, so threads share the matrix without copies
+    results = Parallel(n_jobs=n_jobs, prefer="threads")(
+        delayed(_top_k_block)(embeddings, start, stop, k) for start, stop in blocks
+    )
+
+    ids = np.full((n, k), -1, dtype=np.int32)
+    sims = np.zeros((n, k), dtype=np.float16)
+    for (start, stop), (block_ids, block_sims) in zip(blocks, results):
+        ids[start:stop, :block_ids.shape[1]] = block_ids
+        sims[start:stop, :block_sims.shape[1]] = block_sims
+    return NeighborTable(ids, sims)
+
+
+def meta_path(ids_path: str) -> str:
+    return os.path.splitext(ids_path)[0] + ".meta.json"
+
+
+def save_neighbor_table(table: NeighborTable, ids_path=NEIGHBOR_IDS_PATH, sims_path=NEIGHBOR_SIMS_PATH,
+                        fingerprint: str | None = None):
+    """Saves the table with the fingerprint of the catalogue and embeddings it was built from."""
+    np.save(ids_path, table.ids)
+    np.save(sims_path, table.sims)
+    with open(meta_path(ids_path), "w", encoding="utf-8") as f:
+        json.dump({"fingerprint": fingerprint, "rows": len(table), "k": table.k}, f)
+
+
+@lru_cache(maxsize=1)
+def load_neighbor_table(ids_path=NEIGHBOR_IDS_PATH, sims_path=NEIGHBOR_SIMS_PATH, fingerprint: str | None = None,
+                        rows: int | None = None):
+    """
+    Memory-maps the neighbor table, or returns None if it has not been built or
+    does not match the catalogue (``fingerprint`` and ``rows``), so a stale
+    table never serves neighbors of shifted rows.
+    """
+    if not (os.path.exists(ids_path) and os.path.exists(sims_path)):
+        return None
+    try:
+        with open(meta_path(ids_path), encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError) as exc:
+        warnings.warn(f"Ignoring the neighbor table {ids_path}: no readable build metadata ({exc})")
+        return None
+    if fingerprint is not None and meta.get("fingerprint") != fingerprint:
+        warnings.warn(f"Ignoring the neighbor table {ids_path}: built for another catalogue or embeddings; rebuild it")
+        return None
+    table = NeighborTable(np.load(ids_path, mmap_mode="r"), np.load(sims_path, mmap_mode="r"))
+    if len(table.sims) != len(table) or meta.get("rows") != len(table) or (rows is not None and rows != len(table)):
+        warnings.warn(f"Ignoring the neighbor table {ids_path}: its {len(table):,} rows do not match the catalogue")
+        return None
+    return table
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the Smart Match neighbor table.")
+    parser.add_argument("--embeddings", default=EMB_PATH)
+    parser.add_argument("--csv", default=DATA_PATH, help="catalogue the table is fingerprinted against")
+    parser.add_argument("--k", type=int, default=200, help="neighbors stored per book")
+    parser.add_argument("--jobs", type=int, default=-1, help="parallel workers (-1 = all cores)")
+    parser.add_argument("--block-size", type=int, default=512)
+    parser.add_argument("--ids-out", default=NEIGHBOR_IDS_PATH)
+    parser.add_argument("--sims-out", default=NEIGHBOR_SIMS_PATH)
+    args = parser.parse_args()
+
+    embeddings = np.load(args.embeddings, mmap_mode="r")
+    start = time.perf_counter()
+    table = build_neighbor_table(embeddings, k=args.k, n_jobs=args.jobs, block_size=args.block_size)
+    save_neighbor_table(table, args.ids_out, args.sims_out, snapshot_key(args.csv))
+    print(f"Built {len(table):,} x {table.k} neighbor table in {time.perf_counter() - start:.1f}s "
+          f"({(table.ids.nbytes + table.sims.nbytes) / 1e6:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,55 +1,23 @@
 import pandas as pd
 import numpy as np
-import os
 import re
 from functools import lru_cache
-from app.utils.language import lang_to_iso, iso_to_display
-from app.utils.sorting import sort_lns_iterable
+from app.utils.sorting import sort_lns_iterable, sort_df_by_title_lns, partial_order, TITLE_RANK_COL
+from app.utils.search_index import SearchIndex
+from app.models.catalogue import load_catalogue
 
 @lru_cache(maxsize=1)
 def load_df(csv_path: str):
-    if not os.path.exists(csv_path):
-        raise FileNotFoundError(f"CSV not found at {csv_path}")
-    df = pd.read_csv(csv_path)
-
-    # Ensure all expected columns exist
-    expected_cols = ["title", "author", "rating", "description", "genres", "language", "publisher", "coverImg"]
-    for col in expected_cols:
-        if col not in df.columns:
-            df[col] = np.nan
-
-    # Convert rating to numeric
-    df["rating"] = pd.to_numeric(df["rating"], errors="coerce")
-
-    # Fill missing values and convert to string
-    text_cols = ["title", "author", "description", "genres", "language", "publisher", "coverImg"]
-    for col in text_cols:
-        df[col] = df[col].fillna("").astype(str)
-
-    # Clean genre strings
-    df["genres"] = (
-        df["genres"]
-        .str.replace("[", "", regex=False)       # remove opening bracket
-        .str.replace("]", "", regex=False)       # remove closing bracket
-        .str.replace("'", "", regex=False)       # remove single quotes
-        .str.replace('"', "", regex=False)       # remove double quotes
-        .str.replace(";", ",")                   # unify separators
-        .str.replace("|", ",")
-        .str.replace("  ", " ")                  # collapse double spaces
-        .str.strip()
-    )
-
-    # Normalize language codes
-    df["language_raw"] = df["language"].astype(str)
-    df["language_code"] = df["language_raw"].apply(lang_to_iso)
-    df["language"] = df["language_code"].apply(iso_to_display)
-
-    # Extract unique values for filters
+    # Quick Pick view of the shared catalogue: author and genres as plain strings
+    df = load_catalogue(csv_path).view("quick")
+
+    # Extract unique genres for the filter list
     all_genres = sort_lns_iterable({g.strip() for s in df["genres"] if s for g in s.split(",") if g.strip()})
-    titles = sort_lns_iterable(set(df["title"]))
-    authors = sort_lns_iterable(set(df["author"]))
 
-    return df, all_genres, titles, authors
+    # Inverted index answering the text filters without scanning every row
+    search_index = SearchIndex(df)
+
+    return df, all_genres, search_index
 
 
 def apply_multi_filter(
@@ -62,7 +30,65 @@ def apply_multi_filter(
     shuffle: bool = True,
     seed: int | None = None,
     limit: int | None = None,
+    search_index: SearchIndex | None = None,
 ):
+    if search_index is not None and search_index.n_rows == len(df):
+        # Same rows as the pandas path, answered from posting lists
+        mask = search_index.filter_mask(title_kw, author_kw, genre_kw, lang_kw, pub_kw)
+        filtered_df = df[mask]
+    else:
+        filtered_df = _scan_filter(df, title_kw, author_kw, genre_kw, lang_kw, pub_kw)
+
+    # Shuffle and limit results
+    if shuffle and not filtered_df.empty:
+        filtered_df = filtered_df.sample(frac=1, random_state=seed)
+    if limit is not None:
+        filtered_df = filtered_df.head(limit)
+
+    return filtered_df.reset_index(drop=True)
+
+
+def filter_row_ids(
+    df: pd.DataFrame,
+    title_kw=None,
+    author_kw=None,
+    genre_kw=None,
+    lang_kw=None,
+    pub_kw=None,
+    shuffle: bool = True,
+    seed: int | None = None,
+    search_index: SearchIndex | None = None,
+) -> np.ndarray:
+    """Positional ids of the rows matching the filters, without copying any rows."""
+    if search_index is not None and search_index.n_rows == len(df):
+        ids = np.flatnonzero(search_index.filter_mask(title_kw, author_kw, genre_kw, lang_kw, pub_kw))
+    else:
+        filtered_df = _scan_filter(df.reset_index(drop=True), title_kw, author_kw, genre_kw, lang_kw, pub_kw)
+        ids = filtered_df.index.to_numpy()
+
+    if shuffle and len(ids):
+        ids = ids[np.random.default_rng(seed).permutation(len(ids))]
+    return ids
+
+
+def order_page(df: pd.DataFrame, ids: np.ndarray, order_by: str, start: int, stop: int) -> np.ndarray:
+    """
+    Row ids shown on the page [start, stop) once ``ids`` is put in ``order_by`` order.
+    Only the rows up to ``stop`` are ordered; ties keep the order of ``ids``.
+    """
+    if order_by == "rating (high to low)":
+        keys = -df["rating"].to_numpy(dtype=float)[ids]
+        keys[np.isnan(keys)] = np.inf  # unrated books last, as sort_values does
+    elif TITLE_RANK_COL in df.columns:
+        keys = df[TITLE_RANK_COL].to_numpy()[ids]
+    else:
+        ordered = sort_df_by_title_lns(df.iloc[ids].reset_index(drop=True))
+        return ids[ordered.index.to_numpy()[start:stop]]
+    return ids[partial_order(keys, start, stop)]
+
+
+def _scan_filter(df: pd.DataFrame, title_kw, author_kw, genre_kw, lang_kw, pub_kw):
+    """Fallback filtering with a full ``str.contains`` scan per column."""
     filtered_df = df.copy()
 
     # Apply filters
@@ -78,10 +104,4 @@ def apply_multi_filter(
     if pub_kw:
         filtered_df = filtered_df[filtered_df["publisher"].str.contains(pub_kw, case=False, na=False)]
 
-    # Shuffle and limit results
-    if shuffle and not filtered_df.empty:
-        filtered_df = filtered_df.sample(frac=1, random_state=seed)
-    if limit is not None:
-        filtered_df = filtered_df.head(limit)
-
-    return filtered_df.reset_index(drop=True)
+    return filtered_df
@@ -1,87 +1,197 @@
 import pandas as pd
 import numpy as np
-import ast
-import os
-import random
-from sklearn.neighbors import NearestNeighbors
 from functools import lru_cache
+from app.utils.search_index import TitleIndex
+from app.utils.vector_index import FaissVectorIndex, SklearnVectorIndex
+from app.utils.metrics import METRICS
+from app.models.catalogue import load_catalogue
+
+
+class BookLookup:
+    """Precomputed lookup structures for Smart Match, built once with the data."""
+
+    def __init__(self, df):
+        popularity = df["numRatings"] if "numRatings" in df.columns else df["rating"]
+        self.titles = TitleIndex(df["normalized_title"], popularity=popularity)
+
+        # Integer series ids (-1 = no series)
+        series = df["series"] if "series" in df.columns else pd.Series("", index=df.index)
+        series = series.fillna("").astype(str).str.strip().str.lower()
+        codes, _ = pd.factorize(series)
+        self.series_ids = np.where(series.to_numpy() == "", -1, codes).astype(np.int32)
+
+        # Author ids of every book, flattened with per-row offsets
+        authors = df["author"].apply(lambda a: a if isinstance(a, list) else [a])
+        codes, _ = pd.factorize(pd.Series([a for names in authors for a in names], dtype=object))
+        self.author_codes = codes.astype(np.int32)
+        self.author_offsets = np.concatenate(([0], np.cumsum(authors.map(len).to_numpy()))).astype(np.int64)
+
+    def same_series(self, row_id, others) -> np.ndarray:
+        """Mask of the books in ``others`` belonging to the series of ``row_id``."""
+        series_id = self.series_ids[row_id]
+        if series_id < 0:
+            return np.zeros(len(others), dtype=bool)
+        return self.series_ids[others] == series_id
+
+    def shares_author(self, row_id, others) -> np.ndarray:
+        """Mask of the books in ``others`` sharing at least one author with ``row_id``."""
+        others = np.asarray(others)
+        ref_authors = self.author_codes[self.author_offsets[row_id]:self.author_offsets[row_id + 1]]
+        starts = self.author_offsets[others]
+        counts = self.author_offsets[others + 1] - starts
+        if len(ref_authors) == 0 or counts.sum() == 0:
+            return np.zeros(len(others), dtype=bool)
+        # Positions of every author entry of every book in `others`
+        owner = np.repeat(np.arange(len(others)), counts)
+        flat = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(starts, counts)
+        hits = np.isin(self.author_codes[flat], ref_authors)
+        mask = np.zeros(len(others), dtype=bool)
+        mask[owner[hits]] = True
+        return mask
+
+    def title_options(self, df, row_ids):
+        """Dropdown entries for ``row_ids``; titles shared by several books name the author."""
+        options = []
+        for row_id in row_ids:
+            row = df.iloc[row_id]
+            label = row["title"]
+            if self.titles.count(row_id) > 1:
+                label = f"{label} — {', '.join(row['author'])}"
+            options.append({"id": int(row_id), "title": row["title"], "label": label})
+        return options
+
 
 @lru_cache(maxsize=1)
 def load_df_knn(csv_path):
-    df = pd.read_csv(csv_path)
-
-    def safe_parse_author(x):
-        if isinstance(x, str):
-            try:
-                val = ast.literal_eval(x)
-                return val if isinstance(val, list) else [str(val)]
-            except:
-                return [x]
-        elif isinstance(x, list):
-            return x
-        else:
-            return []
-
-    df["author"] = df["author"].apply(safe_parse_author)
-
-    def safe_parse_genres(x):
-        if isinstance(x, str):
-            try:
-                val = ast.literal_eval(x)
-                return val if isinstance(val, list) else [str(val)]
-            except:
-                return [g.strip() for g in x.replace("[","").replace("]","").replace("'", "").split(",")]
-        elif isinstance(x, list):
-            return x
-        else:
-            return []
-
-    df["genres"] = df["genres"].apply(safe_parse_genres)
-    df["normalized_title"] = df["title"].str.lower().str.strip()
-    df["rating"] = pd.to_numeric(df["rating"], errors="coerce").fillna(0.0)
-
-    return df
-
-def prepare_knn(df, embedding_matrix):
-    model = NearestNeighbors(metric="cosine", algorithm="brute")
-    model.fit(embedding_matrix)
-    return model
-
-def knn_recommend(book_title, exclude_series, exclude_author, top_n, df, embeddings, knn_model, pool_factor=5):
+    # Smart Match view of the shared catalogue: authors and genres as lists
+    df = load_catalogue(csv_path).view("smart")
+    return df, BookLookup(df)
+
+def prepare_knn(df, embedding_matrix, faiss_index=None):
+    """Neighbor search for Smart Match: the shared FAISS index if given, else sklearn brute force."""
+    if faiss_index is not None:
+        return FaissVectorIndex(faiss_index, embedding_matrix)
+    return SklearnVectorIndex(embedding_matrix)
+
+def resolve_book(book_title, df, lookup=None):
+    """
+    Row ids of the books titled ``book_title`` (most popular first with a lookup).
+    Several ids mean the title is shared by different books.
+    """
+    if lookup is not None:
+        return lookup.titles.lookup(book_title)
     book_title = book_title.lower().strip()
-    if book_title not in df["normalized_title"].values:
-        return pd.DataFrame(), "Book not found in the dataset."
-
-    idx = df[df["normalized_title"] == book_title].index[0]
-    pool_n = min(len(df) - 1, max(top_n * pool_factor, top_n + 10))
-    _, indices = knn_model.kneighbors([embeddings[idx]], n_neighbors=pool_n + 1)
-
-    candidates = []
-    ref_row = df.iloc[idx]
-
-    for i in indices[0]:
-        if i == idx:
+    return np.flatnonzero(df["normalized_title"].to_numpy() == book_title)
+
+def knn_recommend(book_title, exclude_series, exclude_author, top_n, df, embeddings, knn_model, pool_factor=5,
+                  book_id=None, lookup=None, neighbor_table=None, seed=None, result_cache=None):
+    if book_id is not None:
+        idx = int(book_id)
+        if not 0 <= idx < len(df):
+            return pd.DataFrame(), "Book not found in the dataset."
+    else:
+        matches = resolve_book(book_title, df, lookup)
+        if len(matches) == 0:
+            return pd.DataFrame(), "Book not found in the dataset."
+        # Shared titles resolve to the most popular edition; pass book_id to pick another
+        idx = int(matches[0])
+
+    if lookup is None:
+        lookup = BookLookup(df)
+
+    return knn_recommend_batch(
+        [idx], exclude_series, exclude_author, top_n, df, embeddings, knn_model, lookup,
+        neighbor_table=neighbor_table, pool_factor=pool_factor, seed=seed, result_cache=result_cache,
+    )[0]
+
+def knn_recommend_batch(book_ids, exclude_series, exclude_author, top_n, df, embeddings, knn_model, lookup,
+                        neighbor_table=None, pool_factor=5, seed=None, result_cache=None):
+    """
+    ``knn_recommend`` for many seed books at once: the seeds missing from the
+    neighbor table share one multi-query search. Returns a (results, message)
+    pair per seed; unknown ids get an empty result.
+    With a ``seed`` the random pick is reproducible, and so cacheable in ``result_cache``.
+    """
+    book_ids = [int(i) for i in book_ids]
+    outputs = [(pd.DataFrame(), "Book not found in the dataset.")] * len(book_ids)
+    use_cache = result_cache is not None and seed is not None
+    fingerprint = df.attrs.get("fingerprint")
+
+    # Serve repeated requests from the cache, compute the rest together
+    todo = []
+    for pos, idx in enumerate(book_ids):
+        if not 0 <= idx < len(df):
             continue
-        row = df.iloc[i]
-
-        if exclude_series:
-            s_ref = str(ref_row.get("series", "") or "").strip().lower()
-            s_row = str(row.get("series", "") or "").strip().lower()
-            if s_ref and s_row and s_ref == s_row:
-                continue
-
-        if exclude_author:
-            a_ref = set(ref_row["author"]) if isinstance(ref_row["author"], list) else {ref_row["author"]}
-            a_row = set(row["author"]) if isinstance(row["author"], list) else {row["author"]}
-            if a_ref & a_row:
-                continue
-
-        candidates.append(row)
-
-    if not candidates:
-        return pd.DataFrame(), "No recommendations found with the current filters."
+        key = ("smart", idx, bool(exclude_series), bool(exclude_author), int(top_n), pool_factor, seed)
+        cached = result_cache.get(key, fingerprint) if use_cache else None
+        if cached is not None:
+            ids, _, message = cached
+            outputs[pos] = (df.iloc[ids] if len(ids) else pd.DataFrame(), message)
+        else:
+            todo.append((pos, idx, key))
+
+    with METRICS.stage("smart.neighbors"):
+        found = neighbor_candidates(
+            [idx for _, idx, _ in todo], exclude_series, exclude_author, top_n, embeddings, knn_model, lookup,
+            neighbor_table, pool_factor,
+        )
+    with METRICS.stage("smart.select"):
+        for (pos, idx, key), candidates in zip(todo, found):
+            ids, message = _recommendations(idx, candidates, top_n, df, lookup, seed)
+            if use_cache:
+                result_cache.put(key, ids, None, message, fingerprint)
+            outputs[pos] = (df.iloc[ids] if len(ids) else pd.DataFrame(), message)
+    return outputs
+
+def neighbor_candidates(row_ids, exclude_series, exclude_author, top_n, embeddings, knn_model, lookup,
+                        neighbor_table=None, pool_factor=5):
+    """Nearest neighbors of every book in ``row_ids`` passing the exclusions, closest first."""
+    n_rows = len(lookup.series_ids)
+    row_ids = np.asarray(row_ids, dtype=np.int64)
+    results = [None] * len(row_ids)
+
+    # Grow the neighbor pool until the filters leave enough candidates
+    pool_n = min(n_rows - 1, max(top_n * pool_factor, top_n + 10))
+    pending = list(range(len(row_ids)))
+    while pending:
+        # Precomputed neighbors where the table covers the pool, one search for the rest
+        neighbors = {}
+        to_search = []
+        for pos in pending:
+            table_row = neighbor_table.get(row_ids[pos]) if neighbor_table is not None else None
+            if table_row is not None and pool_n <= len(table_row):
+                neighbors[pos] = table_row[:pool_n]
+            else:
+                to_search.append(pos)
+        if to_search:
+            _, indices = knn_model.kneighbors(embeddings[row_ids[to_search]], n_neighbors=pool_n + 1)
+            for pos, found in zip(to_search, indices):
+                neighbors[pos] = found[found >= 0]
+
+        still_short = []
+        for pos in pending:
+            idx, found = row_ids[pos], neighbors[pos]
+            keep = found != idx
+            if exclude_series:
+                keep &= ~lookup.same_series(idx, found)
+            if exclude_author:
+                keep &= ~lookup.shares_author(idx, found)
+            results[pos] = found[keep]
+            if len(results[pos]) < top_n and pool_n < n_rows - 1:
+                still_short.append(pos)
+        pending = still_short
+        pool_n = min(n_rows - 1, pool_n * 4)
+    return results
+
+def _recommendations(idx, candidates, top_n, df, lookup, seed=None):
+    """Row ids picked at random among ``candidates``, and the message shown with them."""
+    if len(candidates) == 0:
+        return candidates, "No recommendations found with the current filters."
 
-    random.shuffle(candidates)
-    results = candidates[:top_n]
+    ref_row = df.iloc[idx]
+    candidates = np.random.default_rng(seed).permutation(candidates)
 
-    return pd.DataFrame(results), f"Books similar to: {ref_row['title']}"
+    message = f"Books similar to: {ref_row['title']}"
+    if lookup.titles.count(idx) > 1:
+        message += f" by {', '.join(ref_row['author'])}"
+    return candidates[:top_n], message
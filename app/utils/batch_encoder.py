@@ -0,0 +1,114 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import numpy as np
+from app.utils.metrics import METRICS
+
+
+class BatchingEncoder:
+    """
+    Micro-batching front-end for a sentence embedder.
+    Concurrent ``encode`` calls arriving within ``window_ms`` of each other
+    (up to ``max_batch`` sentences) are encoded in one forward pass, and each
+    caller gets back only its own rows. Drop-in for ``SentenceTransformer.encode``.
+    """
+
+    def __init__(self, embedder, window_ms: float = 5.0, max_batch: int = 32):
+        self.embedder = embedder
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._start()
+        # Threads do not survive fork: a pre-forked worker gets its own batching thread
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._start)
+
+    def _start(self):
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._stats = {"batches": 0, "requests": 0, "sentences": 0, "max_batch_size": 0,
+                       "queue_wait_total_ms": 0.0, "queue_wait_max_ms": 0.0}
+        self._thread = threading.Thread(target=self._run, name="batching-encoder", daemon=True)
+        self._thread.start()
+
+    def encode(self, sentences, convert_to_numpy=True, **kwargs):
+        """Queues ``sentences`` for the next batch and waits for their vectors."""
+        if isinstance(sentences, str):
+            return self.encode([sentences], convert_to_numpy, **kwargs)[0]
+        future = Future()
+        self._queue.put((list(sentences), time.perf_counter(), future))
+        return future.result()
+
+    def __getattr__(self, name):
+        # Everything except encode goes straight to the wrapped model
+        return getattr(self.embedder, name)
+
+    def backlog(self) -> int:
+        """Encode requests waiting for the next batch."""
+        return self._queue.qsize()
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["mean_batch_size"] = stats["sentences"] / stats["batches"] if stats["batches"] else 0.0
+        stats["queue_wait_mean_ms"] = stats["queue_wait_total_ms"] / stats["requests"] if stats["requests"] else 0.0
+        return stats
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _collect(self, first):
+        """Gathers the requests arriving within the window after ``first``."""
+        batch = [first]
+        size = len(first[0])
+        deadline = time.perf_counter() + self.window
+        while size < self.max_batch:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)  # let the main loop stop after this batch
+                break
+            batch.append(item)
+            size += len(item[0])
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = self._collect(first)
+            started = time.perf_counter()
+            texts = [text for sentences, _, _ in batch for text in sentences]
+            try:
+                vectors = np.asarray(self.embedder.encode(texts, convert_to_numpy=True))
+            except Exception as exc:
+                for _, _, future in batch:
+                    future.set_exception(exc)
+                continue
+
+            offset = 0
+            for sentences, _, future in batch:
+                future.set_result(vectors[offset:offset + len(sentences)])
+                offset += len(sentences)
+            self._record(batch, started, len(texts))
+
+    def _record(self, batch, started, n_sentences):
+        waits = [(started - queued) * 1000 for _, queued, _ in batch]
+        for wait in waits:
+            METRICS.observe("encoder_queue_wait_seconds", wait / 1000)
+        METRICS.observe("encoder_batch_size", n_sentences)
+        with self._stats_lock:
+            self._stats["batches"] += 1
+            self._stats["requests"] += len(batch)
+            self._stats["sentences"] += n_sentences
+            self._stats["max_batch_size"] = max(self._stats["max_batch_size"], n_sentences)
+            self._stats["queue_wait_total_ms"] += sum(waits)
+            self._stats["queue_wait_max_ms"] = max(self._stats["queue_wait_max_ms"], max(waits))
@@ -0,0 +1,78 @@
+import re
+import numpy as np
+
+# Number of set bits for every possible byte value
+POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def pack_mask(mask: np.ndarray) -> np.ndarray:
+    """Packs a boolean row mask into a bitmap (8 rows per byte)."""
+    return np.packbits(mask, bitorder="little")
+
+
+def unpack_mask(bits: np.ndarray, n_rows: int) -> np.ndarray:
+    """Unpacks a bitmap back into a boolean row mask of length ``n_rows``."""
+    return np.unpackbits(bits, count=n_rows, bitorder="little").astype(bool)
+
+
+def popcount(bits: np.ndarray) -> np.ndarray:
+    """Number of set bits along the last axis."""
+    return POPCOUNT[bits].sum(axis=-1, dtype=np.int64)
+
+
+class FacetBitmaps:
+    """
+    One packed row bitmap per facet value (a genre, a language...).
+    Filtering ORs bitmaps together; facet counts are ANDs plus popcounts.
+    """
+
+    def __init__(self, row_labels, n_rows: int, labels=None):
+        """
+        row_labels: iterable of (row, label) pairs; a row may carry several labels.
+        labels: optional display order for the labels (defaults to first appearance).
+        """
+        pairs = list(row_labels)
+        seen = list(dict.fromkeys(label for _, label in pairs))
+        self.labels = list(labels) if labels is not None else seen
+        self.label_ids = {label: i for i, label in enumerate(self.labels)}
+        self.n_rows = n_rows
+
+        rows = np.fromiter((r for r, _ in pairs), dtype=np.int64, count=len(pairs))
+        ids = np.fromiter((self.label_ids[l] for _, l in pairs), dtype=np.int64, count=len(pairs))
+        self.bits = np.zeros((len(self.labels), (n_rows + 7) // 8), dtype=np.uint8)
+        np.bitwise_or.at(self.bits, (ids, rows >> 3), (1 << (rows & 7)).astype(np.uint8))
+
+        # Selecting a label matches every label that contains it ("Fantasy" also
+        # finds "Urban Fantasy"), so counts are taken over those combined bitmaps
+        self.match_bits = self.bits.copy()
+        for i, label in enumerate(self.labels):
+            self.match_bits[i] = self.union(self.labels_matching(label, literal=True))
+        self.totals = popcount(self.match_bits)
+
+    def labels_matching(self, kw: str, literal: bool = False):
+        """Ids of the labels containing ``kw``, case-insensitively."""
+        if literal and kw.isascii():
+            # Plain lowercase containment is exact against ASCII labels
+            low = kw.lower()
+            pattern = re.compile(re.escape(kw), flags=re.IGNORECASE)
+            return [
+                i for i, label in enumerate(self.labels)
+                if (low in label.lower() if label.isascii() else pattern.search(label))
+            ]
+        pattern = re.compile(re.escape(kw) if literal else kw, flags=re.IGNORECASE)
+        return [i for i, label in enumerate(self.labels) if pattern.search(label)]
+
+    def union(self, label_ids) -> np.ndarray:
+        """Bitmap of the rows carrying any of ``label_ids``."""
+        if len(label_ids) == 0:
+            return np.zeros(self.bits.shape[1], dtype=np.uint8)
+        return np.bitwise_or.reduce(self.bits[label_ids], axis=0)
+
+    def mask(self, label_ids) -> np.ndarray:
+        """Boolean row mask of the rows carrying any of ``label_ids``."""
+        return unpack_mask(self.union(label_ids), self.n_rows)
+
+    def counts(self, bits: np.ndarray | None = None) -> dict:
+        """Rows matched by each label, restricted to the rows set in ``bits`` (all rows if None)."""
+        totals = self.totals if bits is None else popcount(self.match_bits & bits)
+        return dict(zip(self.labels, totals.tolist()))
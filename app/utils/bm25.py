@@ -0,0 +1,89 @@
+import numpy as np
+from scipy import sparse
+
+
+class BM25Index:
+    """
+    Okapi BM25 over a list of documents, stored as a sparse document-term
+    matrix of precomputed term weights. Scoring a batch of queries is one
+    sparse matrix product.
+    """
+
+    def __init__(self, documents, k1: float = 1.5, b: float = 0.75):
+        from sklearn.feature_extraction.text import CountVectorizer
+        vectorizer = CountVectorizer(lowercase=True, token_pattern=r"(?u)\b\w+\b", dtype=np.float32)
+        counts = vectorizer.fit_transform(documents).tocsr()
+        self.analyzer = vectorizer.build_analyzer()
+        self.vocabulary = vectorizer.vocabulary_
+        self.n_docs = counts.shape[0]
+
+        # idf per term and length-normalized tf per (document, term)
+        doc_freq = np.bincount(counts.indices, minlength=counts.shape[1])
+        self.idf = np.log1p((self.n_docs - doc_freq + 0.5) / (doc_freq + 0.5)).astype(np.float32)
+        doc_len = np.asarray(counts.sum(axis=1)).ravel()
+        avg_len = doc_len.mean() if self.n_docs else 0.0
+        norm = k1 * (1 - b + b * doc_len / max(avg_len, 1e-9))
+        tf = counts.data
+        row_norm = np.repeat(norm, np.diff(counts.indptr))
+        counts.data = (tf * (k1 + 1) / (tf + row_norm) * self.idf[counts.indices]).astype(np.float32)
+        self.weights = counts.tocsc()
+
+    def __len__(self):
+        return self.n_docs
+
+    def query_matrix(self, queries) -> sparse.csc_matrix:
+        """Term counts of ``queries`` as a (n_terms, n_queries) matrix; unknown terms are dropped."""
+        rows, cols = [], []
+        for q, query in enumerate(queries):
+            terms = [self.vocabulary[t] for t in self.analyzer(query) if t in self.vocabulary]
+            rows.extend(terms)
+            cols.extend([q] * len(terms))
+        data = np.ones(len(rows), dtype=np.float32)
+        return sparse.csc_matrix((data, (rows, cols)), shape=(self.weights.shape[1], len(queries)))
+
+    def scores(self, queries) -> sparse.csc_matrix:
+        """
+        BM25 scores as a sparse (n_docs, n_queries) matrix: column q holds only
+        the documents sharing a term with query q (in no particular order).
+        """
+        return (self.weights @ self.query_matrix(queries)).tocsc()
+
+    def search(self, queries, k: int, allowed: np.ndarray | None = None):
+        """
+        (scores, row_ids) of the ``k`` best matching documents per query, best first.
+        Only documents sharing a term with the query (and ``allowed``) are returned; the rest is -1.
+        """
+        scores = self.scores(queries)
+        n_queries = scores.shape[1]
+        k = min(k, self.n_docs)
+        out_scores = np.zeros((n_queries, k), dtype=np.float32)
+        out_ids = np.full((n_queries, k), -1, dtype=np.int64)
+        for q in range(n_queries):
+            # Only this query's matching documents, never a dense row over the catalogue
+            start, stop = scores.indptr[q], scores.indptr[q + 1]
+            hits, values = scores.indices[start:stop], scores.data[start:stop]
+            keep = values > 0
+            if allowed is not None:
+                keep &= allowed[hits]
+            hits, values = hits[keep], values[keep]
+            if len(hits) > k:
+                top = np.argpartition(-values, k - 1)[:k]
+                hits, values = hits[top], values[top]
+            order = np.lexsort((hits, -values))
+            out_scores[q, :len(hits)] = values[order]
+            out_ids[q, :len(hits)] = hits[order]
+        return out_scores, out_ids
+
+
+def reciprocal_rank_fusion(rankings, k: int = 60, limit: int | None = None):
+    """
+    Fuses ranked id lists (best first, -1 = empty slot) with RRF: each id scores
+    sum(1 / (k + rank)). Returns (ids, scores), best first.
+    """
+    fused = {}
+    for ranking in rankings:
+        for rank, row_id in enumerate(int(i) for i in ranking if i >= 0):
+            fused[row_id] = fused.get(row_id, 0.0) + 1.0 / (k + rank + 1)
+    ordered = sorted(fused.items(), key=lambda item: -item[1])[:limit]
+    ids = np.array([row_id for row_id, _ in ordered], dtype=np.int64)
+    return ids, np.array([score for _, score in ordered], dtype=np.float32)
@@ -0,0 +1,128 @@
+import os
+import threading
+import zipfile
+from collections import OrderedDict
+from contextlib import contextmanager
+import numpy as np
+from app.utils.files import atomic_write
+
+try:
+    import fcntl
+except ImportError:  # Windows: saves are not serialized across processes
+    fcntl = None
+
+
+class QueryEmbeddingCache:
+    """
+    LRU cache of normalized query vectors, keyed on normalized query text.
+    Optionally saved to and restored from an ``.npz`` file so popular
+    queries stay warm across restarts. Each serving process merges its
+    entries into that file on save.
+    """
+
+    def __init__(self, maxsize: int = 1024, path: str | None = None):
+        self.maxsize = maxsize
+        self.path = path or None
+        self.hits = 0
+        self.misses = 0
+        self._vectors = OrderedDict()
+        self._lock = threading.Lock()
+        # Process that last added a query (not from the file); a pre-fork master never does, so it never saves
+        self._writer_pid = None
+        if self.path and os.path.exists(self.path):
+            self.load(self.path)
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        """Cache key: whitespace-collapsed, lowercased text (the MiniLM tokenizer is uncased)."""
+        return " ".join(str(query).split()).lower()
+
+    def __len__(self):
+        return len(self._vectors)
+
+    def get(self, query: str):
+        key = self.normalize(query)
+        with self._lock:
+            vec = self._vectors.get(key)
+            if vec is None:
+                self.misses += 1
+                return None
+            self._vectors.move_to_end(key)
+            self.hits += 1
+            return vec
+
+    def put(self, query: str, vec: np.ndarray):
+        self._insert(self.normalize(query), vec)
+        self._writer_pid = os.getpid()
+
+    def _insert(self, key: str, vec: np.ndarray):
+        vec = np.asarray(vec, dtype="float32").reshape(1, -1)
+        vec.setflags(write=False)
+        with self._lock:
+            self._vectors[key] = vec
+            self._vectors.move_to_end(key)
+            while len(self._vectors) > self.maxsize:
+                self._vectors.popitem(last=False)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def save(self, path: str | None = None):
+        """
+        Merges the cached entries into the file, most recently used last:
+        entries already on disk (saved by other workers or earlier runs) are
+        kept behind this process's own, up to ``maxsize``. Only a process that
+        encoded queries itself writes, so a pre-fork master exiting after its
+        workers does not overwrite what they saved.
+        """
+        path = path or self.path
+        if not path or self._writer_pid != os.getpid():
+            return
+        with self._lock:
+            entries = list(self._vectors.items())
+        with _file_lock(path):
+            merged = OrderedDict()
+            if os.path.exists(path):
+                dim = entries[0][1].shape[1] if entries else None
+                merged.update((key, vec) for key, vec in self._read(path) if dim is None or vec.shape[1] == dim)
+            for key, vec in entries:
+                merged.pop(key, None)
+                merged[key] = vec
+            keys = list(merged)[-self.maxsize:] if self.maxsize > 0 else []
+            vectors = np.vstack([merged[key] for key in keys]) if keys else np.empty((0, 0), dtype="float32")
+            with atomic_write(path) as f:
+                np.savez(f, keys=np.array(keys, dtype=str), vectors=vectors)
+
+    def load(self, path: str):
+        for key, vec in self._read(path):
+            self._insert(key, vec)
+
+    @staticmethod
+    def _read(path: str) -> list:
+        """(key, vector) pairs saved in ``path``; none if it is unreadable."""
+        try:
+            with open(path, "rb") as f, np.load(f, allow_pickle=False) as data:
+                return [(key, vec.reshape(1, -1)) for key, vec in zip(data["keys"].tolist(), data["vectors"])]
+        except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+            return []
+
+
+@contextmanager
+def _file_lock(path: str):
+    """Exclusive lock on ``path`` + ".lock" across processes (a no-op without fcntl)."""
+    if fcntl is None:
+        yield
+        return
+    with open(path + ".lock", "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
@@ -0,0 +1,26 @@
+import os
+import tempfile
+from contextlib import contextmanager
+
+
+@contextmanager
+def atomic_write(path: str, mode: str = "wb"):
+    """
+    File object whose contents replace ``path`` in one step once the block
+    exits cleanly; on error the partial file is removed and ``path`` is left as
+    it was. Every writer gets a temp file of its own next to ``path``, so
+    concurrent writers (pre-forked workers, a CLI build beside the server)
+    never write over each other's.
+    """
+    f = tempfile.NamedTemporaryFile(mode, dir=os.path.dirname(path) or ".", prefix=os.path.basename(path) + ".",
+                                    suffix=".tmp", delete=False)
+    try:
+        with f:
+            yield f
+        os.replace(f.name, path)
+    except BaseException:
+        try:
+            os.remove(f.name)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,334 @@
+"""
+Memory attributable to each loaded artifact (datasets, indexes, models) and to the process.
+
+    python -m app.utils.memory [--json] [--budget rss=2048 --budget catalogue=600 ...]
+
+loads every warm-up stage in turn, measuring what each load added to the
+Python heap (tracemalloc) and to the process RSS, then reports the size of
+every artifact: DataFrames by the deep size of their columns (like
+``memory_usage(deep=True)``, but counting shared strings once), arrays by
+``nbytes``, FAISS indexes by their code storage and torch models by their
+weights. Memory shared between artifacts (catalogue views, the one embedding
+matrix) is counted once, under the first artifact holding it. Memory-mapped
+arrays are reported apart, as "mapped": their pages are file-backed and
+shared between worker processes. FAISS storage always counts as in memory,
+and ONNX Runtime sessions are opaque: for those, read the RSS their load added.
+
+Exits with status 1 when a budget (MB) is exceeded; budgets name an artifact,
+"artifacts" (their total) or a process figure (rss, pss, private, shared).
+"""
+import argparse
+import gc
+import json
+import mmap
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+import types
+import numpy as np
+import pandas as pd
+
+# Objects never walked into: code, types and threads, which are not artifact data
+_SKIP_TYPES = (
+    type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType,
+    threading.Thread, type(threading.Lock()),
+)
+_SCALAR_TYPES = (str, bytes, int, float, bool, complex, type(None), np.generic)
+
+
+class Sizer:
+    """
+    Estimated bytes held by objects, counting anything reachable from several
+    of them (shared columns, arrays viewed by several objects) only once.
+    """
+
+    def __init__(self):
+        self.seen = set()     # ids of the objects walked
+        self.buffers = set()  # ids of the array buffers counted
+
+    def size(self, obj) -> tuple:
+        """(bytes in memory, bytes memory-mapped) newly reachable from ``obj``."""
+        total = mapped = 0
+        stack = [obj]
+        while stack:
+            obj = stack.pop()
+            if id(obj) in self.seen or isinstance(obj, _SKIP_TYPES):
+                continue
+            self.seen.add(id(obj))
+
+            if isinstance(obj, _SCALAR_TYPES):
+                total += sys.getsizeof(obj)
+            elif isinstance(obj, np.ndarray):
+                in_memory, in_map = self._array(obj)
+                total += in_memory
+                mapped += in_map
+                if obj.dtype == object:
+                    stack.extend(obj.ravel())
+            elif isinstance(obj, (pd.DataFrame, pd.Series)):
+                in_memory, in_map = self._frame(obj)
+                total += in_memory
+                mapped += in_map
+            elif _is_faiss_index(obj):
+                total += _faiss_bytes(obj)
+            elif _is_torch_module(obj):
+                total += sum(t.numel() * t.element_size() for t in list(obj.parameters()) + list(obj.buffers()))
+            elif isinstance(obj, dict):
+                total += sys.getsizeof(obj)
+                try:
+                    items = list(obj.items())
+                except RuntimeError:  # resized by a request meanwhile (live caches)
+                    items = []
+                stack.extend(key for key, _ in items)
+                stack.extend(value for _, value in items)
+            elif isinstance(obj, (list, tuple, set, frozenset)):
+                total += sys.getsizeof(obj)
+                stack.extend(obj)
+            else:
+                total += sys.getsizeof(obj)
+                if hasattr(obj, "__dict__"):
+                    stack.extend(vars(obj).values())
+                for slot in getattr(type(obj), "__slots__", ()):
+                    if hasattr(obj, slot):
+                        stack.append(getattr(obj, slot))
+        return total, mapped
+
+    def _array(self, arr) -> tuple:
+        """Bytes of the buffer behind ``arr`` (views count their base), unless already counted."""
+        root = arr
+        while isinstance(root, np.ndarray) and root.base is not None:
+            if isinstance(root, np.memmap) or isinstance(root.base, mmap.mmap):
+                break
+            root = root.base
+        if id(root) in self.buffers:
+            return 0, 0
+        self.buffers.add(id(root))
+        if not isinstance(root, np.ndarray):
+            return arr.nbytes, 0  # buffer owned by another library (e.g. FAISS), sized as viewed
+        if isinstance(root, np.memmap) or isinstance(root.base, mmap.mmap):
+            return 0, root.nbytes
+        return root.nbytes, 0
+
+    def _frame(self, frame) -> tuple:
+        """Deep size of each column not counted yet, plus the index."""
+        total = mapped = 0
+        columns = frame.items() if isinstance(frame, pd.DataFrame) else [(frame.name, frame)]
+        for _, column in columns:
+            values = column.to_numpy(copy=False)
+            in_memory, in_map = self._array(values)
+            total += in_memory
+            mapped += in_map
+            # Columns of one block share its buffer, so object columns are told apart by address
+            key = (values.__array_interface__["data"][0], values.strides)
+            if values.dtype == object and key not in self.buffers:
+                self.buffers.add(key)
+                total += _object_bytes(values)
+        if id(frame.index) not in self.seen:
+            self.seen.add(id(frame.index))
+            total += int(frame.index.memory_usage(deep=True))
+        return total, mapped
+
+
+def _object_bytes(values: np.ndarray) -> int:
+    """
+    Deep size of the objects in an object array, and of the items of the lists
+    among them, counting each distinct object once (unlike memory_usage(deep=True),
+    which counts a string shared by a million rows a million times).
+    """
+    ids = np.fromiter(map(id, values), dtype=np.int64, count=len(values))
+    distinct = values[np.unique(ids, return_index=True)[1]]
+    total = sum(map(sys.getsizeof, distinct))
+    items = [item for value in distinct if isinstance(value, list) for item in value]
+    if items:
+        item_ids = np.fromiter(map(id, items), dtype=np.int64, count=len(items))
+        total += sum(sys.getsizeof(items[i]) for i in np.unique(item_ids, return_index=True)[1])
+    return total
+
+
+def _is_faiss_index(obj) -> bool:
+    return type(obj).__module__.startswith("faiss") and hasattr(obj, "ntotal")
+
+
+def _faiss_bytes(index) -> int:
+    """Size of a FAISS index's stored codes (and graph / coarse quantizer where it has one)."""
+    import faiss
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexIVF):
+        invlists = index.invlists
+        codes = sum(invlists.list_size(i) for i in range(invlists.nlist)) * (invlists.code_size + 8)
+        return codes + _faiss_bytes(index.quantizer)
+    if isinstance(index, faiss.IndexHNSW):
+        return _faiss_bytes(index.storage) + index.hnsw.neighbors.size() * 4 + index.hnsw.offsets.size() * 8
+    code_size = getattr(index, "code_size", index.d * 4)
+    return index.ntotal * code_size
+
+
+def _is_torch_module(obj) -> bool:
+    return hasattr(obj, "parameters") and hasattr(obj, "buffers") and type(obj).__module__.split(".")[0] in (
+        "torch", "sentence_transformers",
+    )
+
+
+def process_memory(pid="self") -> dict:
+    """
+    RSS of process ``pid`` (default: this one) in MB, split into shared and
+    private pages (Linux), else the peak RSS of this process.
+    """
+    try:
+        fields = {}
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == "kB":
+                    fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    except OSError:
+        if pid != "self":
+            raise
+        # ru_maxrss is reported in KB on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return {"max_rss_mb": round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)}
+    return {
+        "rss_mb": round(fields.get("Rss", 0.0), 1),
+        "pss_mb": round(fields.get("Pss", 0.0), 1),
+        "shared_mb": round(fields.get("Shared_Clean", 0.0) + fields.get("Shared_Dirty", 0.0), 1),
+        "private_mb": round(fields.get("Private_Clean", 0.0) + fields.get("Private_Dirty", 0.0), 1),
+        "anonymous_mb": round(fields.get("Anonymous", 0.0), 1),
+        "swap_mb": round(fields.get("Swap", 0.0), 1),
+    }
+
+
+def _rss_mb() -> float:
+    return process_memory().get("rss_mb", 0.0)
+
+
+def memory_report(artifacts: dict, loads: dict | None = None) -> dict:
+    """
+    Sizes of ``artifacts`` (name -> loaded value, e.g. warm-up stage values),
+    broken down by component for tuples, with the load measurements in
+    ``loads`` and the memory of the whole process.
+    """
+    # Process figures first, before sizing allocates anything
+    process = process_memory()
+    sizer = Sizer()
+    report = {}
+    for name, value in artifacts.items():
+        parts = value if isinstance(value, tuple) else (value,)
+        components = {}
+        for part in parts:
+            in_memory, in_map = sizer.size(part)
+            label = type(part).__name__
+            previous = components.get(label, {"mb": 0.0, "mapped_mb": 0.0})
+            components[label] = {"mb": round(previous["mb"] + in_memory / 1e6, 2),
+                                 "mapped_mb": round(previous["mapped_mb"] + in_map / 1e6, 2)}
+        report[name] = {
+            "mb": round(sum(c["mb"] for c in components.values()), 2),
+            "mapped_mb": round(sum(c["mapped_mb"] for c in components.values()), 2),
+            "components": components,
+            **({"load": loads[name]} if loads and name in loads else {}),
+        }
+    result = {
+        "artifacts": report,
+        "totals": {
+            "artifacts_mb": round(sum(a["mb"] for a in report.values()), 2),
+            "mapped_mb": round(sum(a["mapped_mb"] for a in report.values()), 2),
+        },
+        "process": process,
+    }
+    if tracemalloc.is_tracing():
+        current, peak = tracemalloc.get_traced_memory()
+        result["tracemalloc"] = {"current_mb": round(current / 1e6, 2), "peak_mb": round(peak / 1e6, 2)}
+    return result
+
+
+def check_budgets(report: dict, budgets: dict) -> list:
+    """Messages for every budget (name -> MB) the report exceeds."""
+    process = report["process"]
+    failures = []
+    for name, limit in budgets.items():
+        if name in report["artifacts"]:
+            used = report["artifacts"][name]["mb"]
+        elif f"{name}_mb" in process:
+            used = process[f"{name}_mb"]
+        elif name == "artifacts":
+            used = report["totals"]["artifacts_mb"]
+        else:
+            failures.append(f"unknown budget {name!r}")
+            continue
+        if used > limit:
+            failures.append(f"{name}: {used:.1f} MB > budget {limit:.1f} MB")
+    return failures
+
+
+def load_stages(warmup, names=None, trace=True):
+    """Loads warm-up stages one by one; returns (values, load measurements, errors)."""
+    if trace and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    values, loads, errors = {}, {}, {}
+    for name in names or list(warmup.stages):
+        gc.collect()
+        rss = _rss_mb()
+        traced = tracemalloc.get_traced_memory()[0] if trace else 0
+        start = time.perf_counter()
+        try:
+            values[name] = warmup.get(name)
+        except Exception as exc:
+            errors[name] = str(exc)
+            continue
+        loads[name] = {
+            "seconds": round(time.perf_counter() - start, 3),
+            "rss_added_mb": round(_rss_mb() - rss, 1),
+        }
+        if trace:
+            loads[name]["traced_added_mb"] = round((tracemalloc.get_traced_memory()[0] - traced) / 1e6, 2)
+    return values, loads, errors
+
+
+def _budget(value: str):
+    name, _, mb = value.partition("=")
+    if not name or not mb:
+        raise argparse.ArgumentTypeError("budgets look like rss=2048 or catalogue=600")
+    return name.strip(), float(mb)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report the memory held by each loaded artifact.")
+    parser.add_argument("--stages", nargs="+", help="warm-up stages to load (default: all)")
+    parser.add_argument("--budget", type=_budget, action="append", default=[], metavar="NAME=MB",
+                        help="fail when an artifact or rss/pss/private/shared exceeds MB (repeatable)")
+    parser.add_argument("--no-tracemalloc", action="store_true", help="skip heap tracing (loads faster)")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    # Registers the stages without starting any warm-up threads
+    from app.main.routes import WARMUP
+    values, loads, errors = load_stages(WARMUP, args.stages, trace=not args.no_tracemalloc)
+    report = memory_report(values, loads)
+    report["errors"] = errors
+    failures = check_budgets(report, dict(args.budget))
+    report["budget_failures"] = failures
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"{'artifact':<12} {'MB':>9} {'mapped MB':>10} {'load s':>7} {'+RSS MB':>8} {'+heap MB':>9}  components")
+        for name, a in report["artifacts"].items():
+            load = a.get("load", {})
+            parts = ", ".join(f"{label} {c['mb'] + c['mapped_mb']:.1f}" for label, c in a["components"].items())
+            heap = f"{load['traced_added_mb']:.1f}" if "traced_added_mb" in load else "-"
+            print(f"{name:<12} {a['mb']:>9.1f} {a['mapped_mb']:>10.1f} {load.get('seconds', 0):>7.2f} "
+                  f"{load.get('rss_added_mb', 0):>8.1f} {heap:>9}  {parts}")
+        totals, process = report["totals"], report["process"]
+        print(f"{'total':<12} {totals['artifacts_mb']:>9.1f} {totals['mapped_mb']:>10.1f}")
+        print("\nprocess: " + ", ".join(f"{k[:-3]} {v:.1f} MB" for k, v in process.items()))
+        for name, error in errors.items():
+            print(f"{name}: not loaded ({error})")
+        for failure in failures:
+            print(f"OVER BUDGET {failure}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
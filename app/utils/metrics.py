@@ -0,0 +1,200 @@
+import bisect
+import numbers
+import threading
+from time import perf_counter
+
+# Histogram bucket upper bounds, in seconds
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Bounds for histograms of other units, by metric
+METRIC_BUCKETS = {
+    "encoder_batch_size": (1, 2, 4, 8, 16, 32, 64, 128, 256),
+}
+
+HELP = {
+    "stage_seconds": "Time spent in each stage of a request (encoding, search, filtering, rendering...)",
+    "request_seconds": "Time to produce a response, per endpoint",
+    "requests_total": "Responses sent, per endpoint and status code",
+    "encoder_queue_wait_seconds": "Time an encode request waited for its micro-batch to start",
+    "encoder_batch_size": "Sentences per encoder forward pass",
+}
+
+
+class Histogram:
+    """Counts of observed values per bucket (the last one is +Inf), with their sum."""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class _StageTimer:
+    __slots__ = ("metrics", "name", "key", "start")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+        self.key = ("stage_seconds", (("stage", name),))
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = perf_counter() - self.start
+        self.metrics._observe(self.key, elapsed)
+        trace = getattr(self.metrics._local, "trace", None)
+        if trace is not None:
+            trace[self.name] = trace.get(self.name, 0.0) + elapsed
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Metrics:
+    """
+    Per-stage latency histograms and counters of this process, rendered in the
+    Prometheus text format. ``stage`` times a block of code; while a trace is
+    open on the current thread (``begin_trace``) the same timings are also
+    collected for the request's Server-Timing header. Disabled, ``stage``
+    returns a shared no-op context manager and nothing is recorded.
+    """
+
+    def __init__(self, enabled: bool = True, prefix: str = "readmeup"):
+        self.enabled = enabled
+        self.prefix = prefix
+        self.histograms = {}  # (metric, labels) -> Histogram
+        self.counters = {}    # (metric, labels) -> value
+        self.collectors = []  # callables returning (metric, type, help, labels, value) samples at scrape time
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def stage(self, name: str):
+        """Context manager timing the block as stage ``name``."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _StageTimer(self, name)
+
+    def observe(self, metric: str, seconds: float, **labels):
+        if self.enabled:
+            self._observe((metric, tuple(labels.items())), seconds)
+
+    def inc(self, metric: str, value: float = 1, **labels):
+        if self.enabled:
+            key = (metric, tuple(labels.items()))
+            with self._lock:
+                self.counters[key] = self.counters.get(key, 0) + value
+
+    def collector(self, fn):
+        """Registers ``fn``, called on every scrape for gauges kept elsewhere (cache sizes, hit rates)."""
+        self.collectors.append(fn)
+        return fn
+
+    def begin_trace(self):
+        """Starts collecting this thread's stage timings for a Server-Timing header."""
+        self._local.trace = {}
+
+    def end_trace(self) -> dict:
+        """Stage -> seconds collected since ``begin_trace``."""
+        trace = getattr(self._local, "trace", None)
+        self._local.trace = None
+        return trace or {}
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            histograms = {key: (h.buckets, list(h.counts), h.sum, h.count) for key, h in self.histograms.items()}
+            counters = dict(self.counters)
+
+        families = {}  # metric -> (type, help, lines)
+
+        def family(metric, kind, help_text=None):
+            name = f"{self.prefix}_{metric}"
+            if name not in families:
+                families[name] = (kind, help_text or HELP.get(metric, metric), [])
+            return name, families[name][2]
+
+        for (metric, labels), (buckets, counts, total, count) in sorted(histograms.items()):
+            name, lines = family(metric, "histogram")
+            cumulative = 0
+            for bound, n in zip(tuple(buckets) + (float("inf"),), counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f"{name}_bucket{_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {total:.6f}")
+            lines.append(f"{name}_count{_labels(labels)} {count}")
+
+        for (metric, labels), value in sorted(counters.items()):
+            name, lines = family(metric, "counter")
+            lines.append(f"{name}{_labels(labels)} {_number(value)}")
+
+        for collect in self.collectors:
+            for metric, kind, help_text, labels, value in collect():
+                name, lines = family(metric, kind, help_text)
+                lines.append(f"{name}{_labels(tuple(labels.items()))} {_number(value)}")
+
+        out = []
+        for name, (kind, help_text, lines) in families.items():
+            out.append(f"# HELP {name} {help_text}")
+            out.append(f"# TYPE {name} {kind}")
+            out.extend(lines)
+        return "\n".join(out) + "\n"
+
+    def _observe(self, key, seconds):
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(METRIC_BUCKETS.get(key[0], BUCKETS))
+            histogram.observe(seconds)
+
+
+def _number(value) -> str:
+    """Sample value at full precision (``:g`` keeps only 6 significant digits)."""
+    if isinstance(value, numbers.Integral) or (isinstance(value, float) and value.is_integer() and abs(value) < 2 ** 53):
+        return str(int(value))
+    return repr(float(value))
+
+
+def _labels(labels) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        f'{k}="' + str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"' for k, v in labels
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def server_timing(trace: dict, total: float | None = None) -> str:
+    """Server-Timing header value for stage -> seconds (durations in milliseconds)."""
+    parts = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in trace.items()]
+    if total is not None:
+        parts.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(parts)
+
+
+# Shared by the models and routes; create_app applies READMEUP_METRICS
+METRICS = Metrics()
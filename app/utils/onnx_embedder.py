@@ -0,0 +1,46 @@
+import numpy as np
+
+
+class OnnxEmbedder:
+    """
+    ONNX Runtime version of the all-MiniLM-L6-v2 sentence embedder.
+    Uses the same WordPiece tokenizer, mean pooling over the attention mask and
+    L2 normalization as the SentenceTransformer pipeline, so its vectors can be
+    searched against the existing index. Exposes the same ``encode`` method.
+    """
+
+    def __init__(self, model_path: str, tokenizer_name: str, max_length: int = 256, threads: int = 0):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_pretrained(tokenizer_name)
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+
+    def encode(self, sentences, convert_to_numpy=True, batch_size: int = 32, **kwargs):
+        if isinstance(sentences, str):
+            return self.encode([sentences], batch_size=batch_size)[0]
+        sentences = list(sentences)
+        if not sentences:
+            return np.empty((0, 0), dtype="float32")
+        return np.vstack([self._encode_batch(sentences[i:i + batch_size]) for i in range(0, len(sentences), batch_size)])
+
+    def _encode_batch(self, sentences):
+        encodings = self.tokenizer.encode_batch(list(sentences))
+        feeds = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        token_embeddings = self.session.run(None, {k: v for k, v in feeds.items() if k in self.input_names})[0]
+
+        # Mean pooling over real tokens, then L2 normalization
+        mask = feeds["attention_mask"][..., None].astype("float32")
+        pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        return (pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)).astype("float32")
@@ -0,0 +1,230 @@
+"""
+Opt-in profiling of live requests, and aggregation of the dumps it writes.
+
+Enabled from create_app with READMEUP_PROFILE=sample (a stack sampler, low
+overhead, can keep slow requests) or READMEUP_PROFILE=cprofile (exact call
+counts and times, pstats dumps, only for the one-in-N requests).
+
+    python -m app.utils.profiling [--dir profiles] [--route deep_dive] > stacks.txt
+    flamegraph.pl stacks.txt > flame.svg   # or open stacks.txt in speedscope
+
+collapses every .collapsed dump into one "frame;frame;frame count" file and
+merges the .pstats dumps (--pstats merged.pstats, for snakeviz or gprof2dot).
+"""
+import argparse
+import cProfile
+import glob
+import itertools
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from time import perf_counter
+
+PROFILE_MODES = ("sample", "cprofile")
+
+
+def collapse(frame) -> str:
+    """Stack of ``frame`` as "outermost;...;innermost", one "function (file:line)" per frame."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class StackSampler:
+    """
+    One background thread sampling the stacks of the registered threads every
+    ``interval_ms``. Each registered thread gets a Counter of collapsed stacks.
+    """
+
+    def __init__(self, interval_ms: float = 5.0):
+        self.interval = interval_ms / 1000
+        self._active = {}  # thread id -> Counter
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def start(self, thread_id: int):
+        # Threads do not survive fork: start one per process, on first use
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name="stack-sampler", daemon=True).start()
+        with self._lock:
+            self._active[thread_id] = Counter()
+
+    def stop(self, thread_id: int) -> Counter:
+        with self._lock:
+            return self._active.pop(thread_id, Counter())
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                active = list(self._active.items())
+            if not active:
+                continue
+            frames = sys._current_frames()
+            for thread_id, stacks in active:
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    stacks[collapse(frame)] += 1
+
+
+class RequestProfiler:
+    """
+    Profiles one in ``every`` requests (``routes`` overrides N per endpoint, 0 =
+    never) and, in sample mode, any request slower than ``slow_ms``. Dumps go
+    to ``out_dir`` as <time>-<pid>-<endpoint>-<ms>ms.collapsed / .pstats; only
+    the newest ``keep`` files are kept.
+    """
+
+    def __init__(self, out_dir: str, mode: str = "sample", every: int = 100, routes: dict | None = None,
+                 slow_ms: float = 0.0, keep: int = 200, interval_ms: float = 5.0):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode {mode!r}; expected one of {PROFILE_MODES}")
+        self.out_dir = out_dir
+        self.mode = mode
+        self.every = every
+        self.routes = {name.rsplit(".", 1)[-1]: n for name, n in (routes or {}).items()}
+        self.slow_ms = slow_ms if mode == "sample" else 0.0
+        self.keep = keep
+        self.sampler = StackSampler(interval_ms) if mode == "sample" else None
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        app.before_request(self._before)
+        app.teardown_request(self._after)
+        return self
+
+    def chosen(self, endpoint: str) -> bool:
+        """True for every N-th request to ``endpoint``."""
+        n = self.routes.get(endpoint.rsplit(".", 1)[-1], self.every)
+        if n <= 0:
+            return False
+        counter = self._counters.get(endpoint)
+        if counter is None:
+            counter = self._counters.setdefault(endpoint, itertools.count())
+        return next(counter) % n == 0
+
+    def _before(self):
+        from flask import g, request
+        endpoint = request.endpoint or "unmatched"
+        if endpoint == "static":
+            return
+        chosen = self.chosen(endpoint)
+        if not chosen and not self.slow_ms:
+            return
+        if self.sampler is not None:
+            handle = threading.get_ident()
+            self.sampler.start(handle)
+        else:
+            handle = cProfile.Profile()
+            try:
+                handle.enable()
+            except ValueError:  # another profiler is active on this interpreter
+                return
+        g._profile = (endpoint, chosen, perf_counter(), handle)
+
+    def _after(self, exc=None):
+        from flask import g
+        state = g.pop("_profile", None)
+        if state is None:
+            return
+        endpoint, chosen, start, handle = state
+        elapsed_ms = (perf_counter() - start) * 1000
+        if self.sampler is not None:
+            stacks = self.sampler.stop(handle)
+        else:
+            handle.disable()
+        if not chosen and elapsed_ms < self.slow_ms:
+            return
+
+        os.makedirs(self.out_dir, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S") + f"{time.time() % 1:.3f}"[1:]
+        path = os.path.join(self.out_dir, f"{stamp}-{os.getpid()}-{endpoint}-{elapsed_ms:.0f}ms")
+        if self.sampler is not None:
+            if not stacks:
+                return
+            with open(path + ".collapsed", "w", encoding="utf-8") as f:
+                f.writelines(f"{stack} {count}\n" for stack, count in stacks.items())
+        else:
+            handle.dump_stats(path + ".pstats")
+        self._rotate()
+
+    def _rotate(self):
+        with self._lock:
+            dumps = sorted(glob.glob(os.path.join(self.out_dir, "*.collapsed"))
+                           + glob.glob(os.path.join(self.out_dir, "*.pstats")), key=os.path.basename)
+            for path in dumps[:max(0, len(dumps) - self.keep)]:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+def parse_routes(value: str) -> dict:
+    """"deep_dive=10,quick_pick=0" as {"deep_dive": 10, "quick_pick": 0}."""
+    routes = {}
+    for item in value.split(","):
+        if item.strip():
+            name, _, n = item.partition("=")
+            routes[name.strip()] = int(n)
+    return routes
+
+
+def aggregate(paths) -> Counter:
+    """Sum of the collapsed stacks in ``paths``."""
+    stacks = Counter()
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                stack, _, count = line.rstrip("\n").rpartition(" ")
+                if stack:
+                    stacks[stack] += int(count)
+    return stacks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aggregate request profiles into flame-graph-ready stacks.")
+    parser.add_argument("--dir", default="profiles", help="directory of the dumps (READMEUP_PROFILE_DIR)")
+    parser.add_argument("--route", help="only dumps of this endpoint, e.g. deep_dive")
+    parser.add_argument("--min-ms", type=float, default=0.0, help="only requests at least this slow")
+    parser.add_argument("--pstats", metavar="FILE", help="merge the cProfile dumps into FILE")
+    parser.add_argument("--top", type=int, default=0, help="print the N functions with the most own samples instead")
+    args = parser.parse_args()
+
+    def wanted(path):
+        # <date>-<time>-<pid>-<endpoint>-<ms>ms.<ext>
+        endpoint, _, ms = os.path.splitext(os.path.basename(path))[0].split("-", 3)[-1].rpartition("-")
+        route_ok = not args.route or endpoint.rsplit(".", 1)[-1] == args.route.rsplit(".", 1)[-1]
+        return route_ok and float(ms.rstrip("ms") or 0) >= args.min_ms
+
+    collapsed = sorted(p for p in glob.glob(os.path.join(args.dir, "*.collapsed")) if wanted(p))
+    profiles = sorted(p for p in glob.glob(os.path.join(args.dir, "*.pstats")) if wanted(p))
+
+    if args.pstats and profiles:
+        import pstats
+        merged = pstats.Stats(*profiles)
+        merged.dump_stats(args.pstats)
+        print(f"Merged {len(profiles)} cProfile dumps into {args.pstats}", file=sys.stderr)
+
+    stacks = aggregate(collapsed)
+    if args.top:
+        own = Counter()
+        for stack, count in stacks.items():
+            own[stack.rsplit(";", 1)[-1]] += count
+        total = sum(own.values()) or 1
+        for frame, count in own.most_common(args.top):
+            print(f"{count:>8} {count / total:>6.1%}  {frame}")
+    else:
+        sys.stdout.writelines(f"{stack} {count}\n" for stack, count in stacks.most_common())
+    if collapsed or not profiles:
+        print(f"{len(collapsed)} sampled requests, {sum(stacks.values())} samples", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+import secrets
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+
+class BoundedLRU:
+    """
+    Entries evicted least-recently-used first, after ``ttl_seconds``, or when
+    their sizes exceed ``max_bytes`` in total; the base of the result caches.
+    Subclasses call ``_lookup`` and ``_store`` while holding ``_lock``.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, max_bytes: int):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (value, nbytes, created)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def nbytes(self) -> int:
+        return self._bytes
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+
+    def _clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def _lookup(self, key, accept=None):
+        """The live value for ``key`` (and passing ``accept``), counted as a hit, else None."""
+        entry = self._entries.get(key)
+        if entry is None or self._expired(entry, time.monotonic()) or (accept is not None and not accept(entry[0])):
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def _store(self, key, value, nbytes: int):
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = (value, nbytes, time.monotonic())
+        self._bytes += nbytes
+        self._evict()
+
+    def _expired(self, entry, now) -> bool:
+        return now - entry[2] > self.ttl_seconds
+
+    def _drop(self, key):
+        self._bytes -= self._entries.pop(key)[1]
+
+    def _evict(self):
+        now = time.monotonic()
+        for key in [k for k, entry in self._entries.items() if self._expired(entry, now)]:
+            self._drop(key)
+        # The newest entry is always kept, even if it alone exceeds the byte cap
+        while len(self._entries) > 1 and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            self._drop(next(iter(self._entries)))
+
+
+class ResultSetCache(BoundedLRU):
+    """
+    Bounded cache of result sets (matching row ids) addressed by opaque cursors.
+    Entries are evicted least-recently-used first, after ``ttl_seconds``,
+    or when the cached ids exceed ``max_bytes`` in total.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 600, max_bytes: int = 32 * 1024 * 1024):
+        super().__init__(max_entries, ttl_seconds, max_bytes)
+
+    def put(self, signature, seed: int, ids: np.ndarray) -> str:
+        """Stores the ids for ``signature`` and returns the cursor pointing at them."""
+        ids = np.asarray(ids, dtype=np.int32)
+        ids.setflags(write=False)
+        cursor = secrets.token_urlsafe(12)
+        with self._lock:
+            self._store(cursor, (signature, seed, ids), ids.nbytes)
+        return cursor
+
+    def get(self, cursor: str, signature):
+        """Returns (seed, ids) for a live cursor created for ``signature``, else None."""
+        if not cursor:
+            return None
+        with self._lock:
+            entry = self._lookup(cursor, lambda value: value[0] == signature)
+        return None if entry is None else entry[1:]
+
+
+class RecommendationCache(BoundedLRU):
+    """
+    Finished recommendations (row ids, optional scores and the message) keyed by
+    the normalized request and its variation seed, so a repeated request is a
+    dictionary lookup. Same eviction as ``ResultSetCache``; every entry is
+    dropped when the catalogue fingerprint changes.
+    """
+
+    def __init__(self, max_entries: int = 4096, ttl_seconds: float = 3600, max_bytes: int = 16 * 1024 * 1024):
+        super().__init__(max_entries, ttl_seconds, max_bytes)
+        self.fingerprint = None
+        self.invalidations = 0
+
+    def get(self, key, fingerprint=None):
+        """Returns (ids, scores, message) for ``key``, or None on a miss."""
+        with self._lock:
+            self._check(fingerprint)
+            return self._lookup(key)
+
+    def put(self, key, ids, scores, message: str, fingerprint=None):
+        ids = np.asarray(ids, dtype=np.int32)
+        ids.setflags(write=False)
+        if scores is not None:
+            scores = np.asarray(scores, dtype=np.float32)
+            scores.setflags(write=False)
+        nbytes = ids.nbytes + (scores.nbytes if scores is not None else 0) + len(message)
+        with self._lock:
+            self._check(fingerprint)
+            self._store(key, (ids, scores, message), nbytes)
+
+    def stats(self) -> dict:
+        return {**super().stats(), "invalidations": self.invalidations}
+
+    def _check(self, fingerprint):
+        # Results from another catalogue version point at the wrong rows
+        if fingerprint != self.fingerprint:
+            if self._entries:
+                self.invalidations += 1
+            self._clear()
+            self.fingerprint = fingerprint
@@ -0,0 +1,225 @@
+import heapq
+import re
+import numpy as np
+import pandas as pd
+from app.utils.bitmaps import FacetBitmaps, pack_mask
+from app.utils.sorting import sort_lns_iterable
+
+# Characters that make a keyword behave as a regex instead of a plain substring
+REGEX_META = set(".^$*+?{}[]\\|()")
+
+
+class NgramIndex:
+    """
+    Case-insensitive n-gram index over the distinct values of a text column.
+    Returns the same rows as ``Series.str.contains(kw, case=False, na=False)``.
+    """
+
+    def __init__(self, values, n: int = 3):
+        self.n = n
+        values = pd.Series(values, dtype=object).fillna("").astype(str)
+        codes, uniques = pd.factorize(values, sort=False)
+        self.codes = codes.astype(np.int32)
+        self.uniques = np.asarray(uniques, dtype=object)
+
+        # Posting lists map each n-gram to the distinct values containing it.
+        # Non-ASCII values can match an ASCII keyword through Unicode case
+        # folding (e.g. "ſ" ~ "s"), so they are always verified instead.
+        postings = {}
+        unindexed = []
+        for value_id, value in enumerate(self.uniques):
+            if not value.isascii():
+                unindexed.append(value_id)
+                continue
+            low = value.lower()
+            for gram in {low[i:i + n] for i in range(len(low) - n + 1)}:
+                postings.setdefault(gram, []).append(value_id)
+        self.postings = {g: np.asarray(ids, dtype=np.int32) for g, ids in postings.items()}
+        self.unindexed = np.asarray(unindexed, dtype=np.int32)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def _candidates(self, kw: str, literal: bool = False):
+        """Distinct values that may contain ``kw``, or None if every value must be checked."""
+        low = kw.lower()
+        if len(low) < self.n or not kw.isascii() or (not literal and REGEX_META & set(kw)):
+            return None
+        grams = sorted({low[i:i + self.n] for i in range(len(low) - self.n + 1)},
+                       key=lambda g: len(self.postings.get(g, ())))
+        result = None
+        for gram in grams:
+            ids = self.postings.get(gram)
+            if ids is None:
+                return self.unindexed
+            result = ids if result is None else np.intersect1d(result, ids, assume_unique=True)
+            if result.size == 0:
+                break
+        return np.union1d(result, self.unindexed)
+
+    def match_values(self, kw: str, literal: bool = False) -> np.ndarray:
+        """Ids of the distinct values matched by ``kw`` (a regex unless ``literal``)."""
+        pattern = re.compile(re.escape(kw) if literal else kw, flags=re.IGNORECASE)
+        candidates = self._candidates(kw, literal)
+        if candidates is None:
+            candidates = range(len(self.uniques))
+        return np.fromiter(
+            (v for v in candidates if pattern.search(self.uniques[v])), dtype=np.int32
+        )
+
+    def value_mask(self, value_ids) -> np.ndarray:
+        """Boolean row mask for the rows holding any of ``value_ids``."""
+        selected = np.zeros(len(self.uniques), dtype=bool)
+        selected[value_ids] = True
+        return selected[self.codes]
+
+    def search(self, kw: str) -> np.ndarray:
+        """Boolean row mask of the rows whose value contains ``kw``."""
+        return self.value_mask(self.match_values(kw))
+
+
+class SearchIndex:
+    """
+    Inverted indexes for the Quick Pick filters, built once per DataFrame:
+    n-gram indexes for the free-text columns and row bitmaps for genres and languages.
+    """
+
+    COLUMNS = ("title", "author", "genres", "publisher")
+
+    def __init__(self, df: pd.DataFrame, n: int = 3):
+        self.n_rows = len(df)
+        self.columns = {col: NgramIndex(df[col], n=n) for col in self.COLUMNS}
+
+        genre_pairs = (
+            (row, g.strip())
+            for row, s in enumerate(df["genres"]) if s
+            for g in s.split(",") if g.strip()
+        )
+        self.genres = FacetBitmaps(genre_pairs, self.n_rows)
+        self.languages = FacetBitmaps(
+            enumerate(df["language"]), self.n_rows, labels=sort_lns_iterable(df["language"].unique())
+        )
+        # Filtering and facet counting run on the same request, so remember the last masks
+        self._last_masks = (None, None)
+
+    def _masks(self, title_kw, author_kw, genre_kw, lang_kw, pub_kw):
+        """Row masks for (text filters, genre filter, language filter); None when unfiltered."""
+        key = (title_kw, author_kw, tuple(genre_kw or ()), lang_kw, pub_kw)
+        last_key, last_masks = self._last_masks
+        if last_key == key:
+            return last_masks
+
+        text = None
+        for col, kw in (("title", title_kw), ("author", author_kw), ("publisher", pub_kw)):
+            if kw:
+                found = self.columns[col].search(kw)
+                text = found if text is None else text & found
+
+        genre = None
+        keywords = [g.strip() for g in genre_kw or []]
+        # An empty alternative matches every row, like the joined regex does
+        if keywords and all(keywords):
+            if any("," in g for g in keywords):
+                # Keywords spanning several genres need the raw string
+                index = self.columns["genres"]
+                value_ids = np.concatenate([index.match_values(g, literal=True) for g in keywords])
+                genre = index.value_mask(value_ids)
+            else:
+                # A genre matches any row carrying a genre that contains it
+                label_ids = sorted({i for g in keywords for i in self.genres.labels_matching(g, literal=True)})
+                genre = self.genres.mask(label_ids)
+
+        lang = self.languages.mask(self.languages.labels_matching(lang_kw)) if lang_kw else None
+        self._last_masks = (key, (text, genre, lang))
+        return text, genre, lang
+
+    def _combine(self, *masks):
+        result = np.ones(self.n_rows, dtype=bool)
+        for mask in masks:
+            if mask is not None:
+                result &= mask
+        return result
+
+    def filter_mask(self, title_kw=None, author_kw=None, genre_kw=None, lang_kw=None, pub_kw=None):
+        """Boolean row mask equivalent to the pandas filters in ``apply_multi_filter``."""
+        return self._combine(*self._masks(title_kw, author_kw, genre_kw, lang_kw, pub_kw))
+
+    def facet_counts(self, title_kw=None, author_kw=None, genre_kw=None, lang_kw=None, pub_kw=None):
+        """
+        Books per genre and per language for the current filter state.
+        Each facet is counted under every filter except its own, so the
+        other options in the same dropdown keep meaningful counts.
+        """
+        text, genre, lang = self._masks(title_kw, author_kw, genre_kw, lang_kw, pub_kw)
+        if text is None and genre is None and lang is None:
+            return self.genres.counts(), self.languages.counts()
+        genre_counts = self.genres.counts(pack_mask(self._combine(text, lang)))
+        language_counts = self.languages.counts(pack_mask(self._combine(text, genre)))
+        return genre_counts, language_counts
+
+
+class TitleIndex:
+    """
+    Title lookup for Smart Match: a trigram index for autocomplete and a hash
+    map from each normalized title to every row that carries it.
+    """
+
+    def __init__(self, normalized_titles, popularity=None, n: int = 3):
+        self.ngrams = NgramIndex(normalized_titles, n=n)
+        codes = self.ngrams.codes
+        n_titles = len(self.ngrams.uniques)
+
+        # Rows grouped by title, most popular first within a title
+        popularity = np.zeros(len(codes)) if popularity is None else np.nan_to_num(np.asarray(popularity, dtype=float))
+        self.row_order = np.lexsort((-popularity, codes)).astype(np.int32)
+        self.row_offsets = np.concatenate(([0], np.cumsum(np.bincount(codes, minlength=n_titles))))
+        self.title_ids = {title: i for i, title in enumerate(self.ngrams.uniques)}
+
+    @staticmethod
+    def normalize(title) -> str:
+        return str(title).lower().strip()
+
+    def _rows(self, title_id) -> np.ndarray:
+        return self.row_order[self.row_offsets[title_id]:self.row_offsets[title_id + 1]]
+
+    def lookup(self, title) -> np.ndarray:
+        """Every row whose normalized title equals ``title``, most popular first."""
+        title_id = self.title_ids.get(self.normalize(title))
+        if title_id is None:
+            return np.empty(0, dtype=np.int32)
+        return self._rows(title_id)
+
+    def count(self, row_id: int) -> int:
+        """Number of rows sharing the title of ``row_id``."""
+        title_id = self.ngrams.codes[row_id]
+        return int(self.row_offsets[title_id + 1] - self.row_offsets[title_id])
+
+    def autocomplete(self, query: str, limit: int = 50) -> np.ndarray:
+        """
+        Row ids of the titles containing ``query``, best matches first:
+        exact title, then title prefix, then word prefix, then any substring.
+        """
+        query = self.normalize(query)
+        if not query:
+            return np.empty(0, dtype=np.int32)
+        uniques = self.ngrams.uniques
+
+        def rank(title_id):
+            title = uniques[title_id]
+            pos = title.find(query)
+            pos = len(title) if pos < 0 else pos
+            if title == query:
+                tier = 0
+            elif pos == 0:
+                tier = 1
+            elif f" {query}" in title:
+                tier = 2
+            else:
+                tier = 3
+            return tier, pos, len(title), title
+
+        # Every title contributes at least one row, so `limit` titles are enough
+        best = heapq.nsmallest(limit, self.ngrams.match_values(query, literal=True), key=rank)
+        if not best:
+            return np.empty(0, dtype=np.int32)
+        return np.concatenate([self._rows(t) for t in best])[:limit]
@@ -1,6 +1,10 @@
 import unicodedata
+import numpy as np
 import pandas as pd
 
+# Column holding each title's precomputed position in LNS order
+TITLE_RANK_COL = "title_lns_rank"
+
 def _lns_rank(s: str):
     """
     Returns (group, normalized_key) where:
@@ -19,8 +23,44 @@ def sort_lns_iterable(iterable):
     """Sorts items by: letters → numbers → symbols."""
     return sorted(iterable, key=_lns_rank)
 
+def lns_rank_positions(values) -> np.ndarray:
+    """
+    Integer sort position of each value in LNS order, computed once per distinct value.
+    Values with the same key share a position, so a stable argsort keeps their order.
+    """
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object).fillna(""), sort=False)
+    order = sorted(range(len(uniques)), key=lambda i: (*_lns_rank(uniques[i]), str(uniques[i])))
+    positions = np.empty(len(uniques), dtype=np.int32)
+    positions[order] = np.arange(len(uniques), dtype=np.int32)
+    return positions[codes]
+
+def partial_order(keys: np.ndarray, start: int, stop: int, full_sort_fraction: float = 0.25) -> np.ndarray:
+    """
+    Positions [start, stop) of ``keys`` in stable ascending order.
+    Selects the first ``stop`` keys with a partition and sorts only those;
+    pages deeper than ``full_sort_fraction`` of the rows fall back to a full sort.
+    """
+    keys = np.asarray(keys)
+    stop = min(stop, len(keys))
+    if start >= stop:
+        return np.empty(0, dtype=np.intp)
+    if stop > len(keys) * full_sort_fraction:
+        return np.argsort(keys, kind="stable")[start:stop]
+    # Keep every key tied with the cutoff so the page matches the stable sort
+    cutoff = np.partition(keys, stop - 1)[stop - 1]
+    candidates = np.flatnonzero(keys <= cutoff)
+    order = candidates[np.argsort(keys[candidates], kind="stable")]
+    return order[start:stop]
+
 def sort_df_by_title_lns(df: pd.DataFrame) -> pd.DataFrame:
     """Sorts a DataFrame by title with priority: letters → numbers → symbols."""
+    if TITLE_RANK_COL in df.columns:
+        # Vectorized path over the precomputed positions
+        return df.take(np.argsort(df[TITLE_RANK_COL].to_numpy(), kind="stable"))
+    return _sort_df_by_title_keys(df)
+
+def _sort_df_by_title_keys(df: pd.DataFrame) -> pd.DataFrame:
+    """Fallback: computes the LNS key of every row on the fly."""
     tmp = df.copy()
     keys = tmp["title"].apply(_lns_rank)
     tmp["__grp"] = keys.apply(lambda t: t[0])
@@ -0,0 +1,26 @@
+import hashlib
+import time
+import numpy as np
+
+
+class StubEmbedder:
+    """
+    Offline stand-in for the sentence embedder, for benchmarks and tests without
+    model downloads: every text maps to a fixed random unit vector seeded by its
+    hash. Exposes the same ``encode`` method; ``delay_ms`` per call emulates model cost.
+    """
+
+    def __init__(self, dim: int = 384, delay_ms: float = 0.0):
+        self.dim = dim
+        self.delay = delay_ms / 1000
+
+    def encode(self, sentences, convert_to_numpy=True, batch_size: int = 32, **kwargs):
+        if isinstance(sentences, str):
+            return self.encode([sentences])[0]
+        if self.delay:
+            time.sleep(self.delay)
+        vectors = np.empty((len(sentences), self.dim), dtype="float32")
+        for i, text in enumerate(sentences):
+            seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+            vectors[i] = np.random.default_rng(seed).standard_normal(self.dim)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
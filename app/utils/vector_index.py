@@ -0,0 +1,182 @@
+import faiss
+import numpy as np
+
+
+class VectorIndex:
+    """
+    Nearest-neighbor search over the book embeddings, row-aligned with the catalogue.
+    ``search`` follows the FAISS convention and ``kneighbors`` the scikit-learn one,
+    so either mode can use any backend.
+    """
+
+    def __init__(self, embeddings=None):
+        self.embeddings = embeddings
+
+    def __len__(self):
+        raise NotImplementedError
+
+    def search(self, queries: np.ndarray, k: int):
+        """Returns (scores, row_ids) arrays of shape (n_queries, k); missing hits are -1."""
+        raise NotImplementedError
+
+    def kneighbors(self, X, n_neighbors: int):
+        return self.search(np.asarray(X, dtype="float32"), n_neighbors)
+
+    def vectors(self, row_ids) -> np.ndarray:
+        """Stored embeddings for ``row_ids``."""
+        return np.asarray(self.embeddings[row_ids], dtype="float32")
+
+    def cosine(self, query: np.ndarray, row_ids) -> np.ndarray:
+        """Cosine similarity of ``query`` to the stored vectors of ``row_ids``, whatever the index metric."""
+        vectors = self.vectors(np.atleast_1d(row_ids))
+        query = np.asarray(query, dtype="float32").ravel()
+        norms = np.linalg.norm(vectors, axis=1) * np.linalg.norm(query)
+        return (vectors @ query / np.clip(norms, 1e-12, None)).astype("float32")
+
+    def search_by_id(self, row_ids, k: int):
+        """Neighbors of books already in the index, queried by row id."""
+        return self.search(self.vectors(np.atleast_1d(row_ids)), k)
+
+    def search_filtered(self, queries: np.ndarray, k: int, allowed: np.ndarray):
+        """
+        Top-``k`` hits restricted to the rows where ``allowed`` is True.
+        Small allowed sets are scored exactly; larger ones widen an unfiltered
+        search until every query has ``k`` allowed hits, so the filters never
+        starve the result while enough matching rows exist.
+        """
+        queries = np.atleast_2d(queries)
+        n_allowed = int(allowed.sum())
+        k = min(k, n_allowed)
+        if k == 0:
+            return np.zeros((len(queries), 0), dtype="float32"), np.full((len(queries), 0), -1, dtype=np.int64)
+        if n_allowed <= self.exact_subset_limit and self.embeddings is not None:
+            return self._search_subset(queries, k, np.flatnonzero(allowed))
+
+        # Start from the pool the filters' selectivity suggests, and widen it while
+        # it stays below the index size; past that, scoring the allowed rows is cheaper
+        # (and approximate indexes may not reach every row even with a full-size pool)
+        pool = min(len(self), max(4 * k, int(k * len(allowed) / n_allowed)))
+        while True:
+            if pool >= len(self) and self.embeddings is not None:
+                return self._search_subset(queries, k, np.flatnonzero(allowed))
+            scores, ids = self.search(queries, pool)
+            keep = (ids >= 0) & allowed[np.clip(ids, 0, None)]
+            if keep.sum(axis=1).min() >= k or pool >= len(self):
+                return _compact(scores, ids, keep, k)
+            pool = min(len(self), pool * 4)
+
+    # Allowed sets up to this size are scored exactly instead of searched
+    exact_subset_limit = 8192
+    # Rows scored at once by _search_subset, bounding its memory to queries x block scores
+    subset_block = 8192
+
+    def _scores(self, queries, row_ids):
+        """Scores of ``row_ids`` for each query in this index's metric (lower is better)."""
+        vectors = self.vectors(row_ids)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True) * np.linalg.norm(vectors, axis=1)
+        return 1 - (queries @ vectors.T) / np.clip(norms, 1e-12, None)
+
+    def _search_subset(self, queries, k, row_ids):
+        """Exact top-``k`` among ``row_ids``, scored a block of rows at a time."""
+        best_scores = np.empty((len(queries), 0), dtype="float32")
+        best_ids = np.empty((len(queries), 0), dtype=np.int64)
+        for start in range(0, len(row_ids), self.subset_block):
+            block = row_ids[start:start + self.subset_block]
+            scores = np.concatenate([best_scores, self._scores(queries, block).astype("float32")], axis=1)
+            ids = np.concatenate([best_ids, np.broadcast_to(block.astype(np.int64), (len(queries), len(block)))], axis=1)
+            if scores.shape[1] > k:
+                top = np.argpartition(scores, k - 1, axis=1)[:, :k]
+                scores, ids = np.take_along_axis(scores, top, axis=1), np.take_along_axis(ids, top, axis=1)
+            best_scores, best_ids = scores, ids
+        # Best first; ties by row id
+        order = np.lexsort((best_ids, best_scores), axis=1)
+        top_scores = np.take_along_axis(best_scores, order, axis=1)
+        return self._to_output_scores(top_scores).astype("float32"), np.take_along_axis(best_ids, order, axis=1)
+
+    def _to_output_scores(self, scores):
+        """Converts "lower is better" scores back to what ``search`` returns."""
+        return scores
+
+
+class FaissVectorIndex(VectorIndex):
+    """Backend over a FAISS index (the one Deep Dive loads)."""
+
+    def __init__(self, index, embeddings=None):
+        super().__init__(embeddings)
+        self.index = index
+
+    def __len__(self):
+        return self.index.ntotal
+
+    def search(self, queries, k, **kwargs):
+        queries = np.ascontiguousarray(queries, dtype="float32")
+        return self.index.search(queries, min(k, self.index.ntotal), **kwargs)
+
+    def search_filtered(self, queries, k, allowed):
+        # Let FAISS skip disallowed rows itself when the index type supports selectors
+        k = min(k, int(allowed.sum()))
+        bitmap = np.packbits(allowed, bitorder="little")
+        params = self._selector_params(faiss.IDSelectorBitmap(len(bitmap), faiss.swig_ptr(bitmap)))
+        if params is None or k == 0:
+            return super().search_filtered(queries, k, allowed)
+        scores, ids = self.search(queries, k, params=params)
+        # Approximate indexes may return fewer hits under a selector; widen instead
+        if (ids < 0).any():
+            return super().search_filtered(queries, k, allowed)
+        return scores, ids
+
+    def _scores(self, queries, row_ids):
+        vectors = self.vectors(row_ids)
+        if self.index.metric_type == faiss.METRIC_INNER_PRODUCT:
+            return -(queries @ vectors.T)
+        # Squared L2 as |q|^2 - 2 q.v + |v|^2: one matrix product, no queries x rows x dim array
+        distances = queries @ vectors.T
+        distances *= -2
+        distances += (queries ** 2).sum(axis=1)[:, None]
+        distances += (vectors ** 2).sum(axis=1)[None, :]
+        return np.maximum(distances, 0, out=distances)
+
+    def _to_output_scores(self, scores):
+        return -scores if self.index.metric_type == faiss.METRIC_INNER_PRODUCT else scores
+
+    def _selector_params(self, selector):
+        index = faiss.downcast_index(self.index)
+        if isinstance(index, faiss.IndexIVF):
+            return faiss.SearchParametersIVF(sel=selector, nprobe=index.nprobe)
+        if isinstance(index, faiss.IndexHNSW):
+            return faiss.SearchParametersHNSW(sel=selector, efSearch=index.hnsw.efSearch)
+        if isinstance(index, faiss.IndexFlat):
+            return faiss.SearchParameters(sel=selector)
+        return None
+
+    def vectors(self, row_ids):
+        if self.embeddings is None:
+            return np.vstack([self.index.reconstruct(int(i)) for i in row_ids])
+        return super().vectors(row_ids)
+
+
+class SklearnVectorIndex(VectorIndex):
+    """Exact brute-force cosine backend using scikit-learn."""
+
+    def __init__(self, embeddings):
+        from sklearn.neighbors import NearestNeighbors
+        super().__init__(embeddings)
+        self.model = NearestNeighbors(metric="cosine", algorithm="brute")
+        self.model.fit(embeddings)
+
+    def __len__(self):
+        return len(self.embeddings)
+
+    def search(self, queries, k):
+        return self.model.kneighbors(queries, n_neighbors=min(k, len(self.embeddings)))
+
+
+def _compact(scores, ids, keep, k):
+    """First ``k`` kept hits of every query, padded with -1 when fewer exist."""
+    out_scores = np.zeros((len(ids), k), dtype=scores.dtype)
+    out_ids = np.full((len(ids), k), -1, dtype=ids.dtype)
+    for q in range(len(ids)):
+        hits = np.flatnonzero(keep[q])[:k]
+        out_scores[q, :len(hits)] = scores[q, hits]
+        out_ids[q, :len(hits)] = ids[q, hits]
+    return out_scores, out_ids
@@ -0,0 +1,99 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class NotReady(RuntimeError):
+    """A stage is still loading (or failed to load) when a request needs it."""
+
+
+class Stage:
+    def __init__(self, name, loader, deps=()):
+        self.name = name
+        self.loader = loader
+        self.deps = tuple(deps)
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+        self.started = False
+        self.value = None
+        self.error = None
+        self.seconds = None
+
+    @property
+    def state(self) -> str:
+        if self.done.is_set():
+            return "failed" if self.error is not None else "ready"
+        return "loading" if self.started else "pending"
+
+
+class Warmup:
+    """
+    Named startup stages (datasets, indexes, models) loaded once each, either
+    in background threads (``start``) or by the first request needing them.
+    A stage's loader receives the values of its ``deps``.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.threads = []
+
+    def stage(self, name, deps=()):
+        """Decorator registering ``loader`` as stage ``name``."""
+        def register(loader):
+            self.stages[name] = Stage(name, loader, deps)
+            return loader
+        return register
+
+    def start(self):
+        """Loads every stage in its own daemon thread; returns immediately."""
+        for stage in self.stages.values():
+            thread = threading.Thread(target=self._load, args=(stage,), name=f"warmup-{stage.name}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def get(self, name, timeout=None):
+        """Value of stage ``name``, loading it here if no thread has started it yet."""
+        stage = self.stages[name]
+        self._load(stage)
+        if not stage.done.wait(timeout):
+            raise NotReady(f"{name} is still loading")
+        if stage.error is not None:
+            raise NotReady(f"{name} failed to load: {stage.error}")
+        return stage.value
+
+    def ready(self, *names) -> bool:
+        return all(self.stages[name].state == "ready" for name in names)
+
+    def loading(self, *names) -> bool:
+        """True if any of the stages has started but not finished loading."""
+        return any(self.stages[name].state == "loading" for name in names)
+
+    def values(self) -> dict:
+        """Values of the stages loaded so far."""
+        return {name: stage.value for name, stage in self.stages.items() if stage.state == "ready"}
+
+    def status(self) -> dict:
+        """State and load time (seconds) of every stage."""
+        return {
+            name: {"state": stage.state, "seconds": stage.seconds, "error": stage.error}
+            for name, stage in self.stages.items()
+        }
+
+    def _load(self, stage):
+        with stage.lock:
+            if stage.started:
+                return
+            stage.started = True
+        try:
+            deps = [self.get(dep) for dep in stage.deps]
+            start = time.perf_counter()
+            stage.value = stage.loader(*deps)
+            stage.seconds = round(time.perf_counter() - start, 3)
+            logger.info("warm-up: %s ready in %.2fs", stage.name, stage.seconds)
+        except Exception as exc:
+            stage.error = f"{type(exc).__name__}: {exc}"
+            logger.exception("warm-up: %s failed", stage.name)
+        finally:
+            stage.done.set()
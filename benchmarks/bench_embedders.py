@@ -0,0 +1,95 @@
+"""
+Compare Deep Dive query embedder backends: startup, per-query latency, memory and drift from torch.
+
+Usage:
+    python -m benchmarks.bench_embedders [--backends torch onnx] [--queries 200]
+
+Every backend runs in a fresh subprocess so startup time and peak RSS are its own.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+from app.models.export_onnx import SAMPLE_QUERIES
+
+
+def _queries(n):
+    """Short, varied queries built from the export samples."""
+    words = " ".join(SAMPLE_QUERIES).split()
+    rng = np.random.default_rng(0)
+    return [" ".join(rng.choice(words, size=rng.integers(3, 16))) for _ in range(n)]
+
+
+def _worker(backend, n_queries, out_path):
+    os.environ["READMEUP_EMBEDDER_BACKEND"] = backend
+    from app.models.deep_model import encode_query, load_embedder
+
+    start = time.perf_counter()
+    embedder = load_embedder()
+    encode_query(embedder, "warm-up")
+    startup = time.perf_counter() - start
+
+    timings, vectors = [], []
+    for query in _queries(n_queries):
+        start = time.perf_counter()
+        vectors.append(encode_query(embedder, query)[0])
+        timings.append(time.perf_counter() - start)
+    np.save(out_path, np.vstack(vectors))
+    timings = np.array(timings) * 1000
+    print(json.dumps({
+        "startup_s": startup,
+        "p50_ms": float(np.percentile(timings, 50)),
+        "p95_ms": float(np.percentile(timings, 95)),
+        # ru_maxrss is reported in KB on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx"], choices=["torch", "onnx"])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--out", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        return _worker(args.worker, args.queries, args.out)
+
+    results, vectors = {}, {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend in args.backends:
+            out = os.path.join(tmp, f"{backend}.npy")
+            proc = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_embedders", "--worker", backend,
+                 "--queries", str(args.queries), "--out", out],
+                capture_output=True, text=True,
+            )
+            if proc.returncode:
+                print(f"{backend}: failed\n{proc.stderr.strip().splitlines()[-1] if proc.stderr else ''}")
+                continue
+            results[backend] = json.loads(proc.stdout.strip().splitlines()[-1])
+            vectors[backend] = np.load(out)
+
+    if "torch" in vectors:
+        for backend, result in results.items():
+            result["min_cosine_vs_torch"] = float((vectors[backend] * vectors["torch"]).sum(axis=1).min())
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'backend':<8} {'startup s':>10} {'p50 ms':>8} {'p95 ms':>8} {'RSS MB':>8} {'cos min':>8}")
+    for backend, r in results.items():
+        cosine = f"{r['min_cosine_vs_torch']:.4f}" if "min_cosine_vs_torch" in r else "-"
+        print(f"{backend:<8} {r['startup_s']:>10.2f} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} "
+              f"{r['peak_rss_mb']:>8.0f} {cosine:>8}")
+
+
+if __name__ == "__main__":
+    main()
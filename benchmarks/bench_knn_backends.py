@@ -0,0 +1,69 @@
+"""
+Compare Smart Match neighbor search: scikit-learn brute force vs. the shared FAISS index.
+
+Usage:
+    python -m benchmarks.bench_knn_backends [--queries 200] [--k 51]
+"""
+import argparse
+import time
+import tracemalloc
+import numpy as np
+from app.models.deep_model import load_faiss_artifacts
+from app.utils.vector_index import FaissVectorIndex, SklearnVectorIndex
+
+
+def _build(factory):
+    """Builds a backend and returns it with the memory it allocated (MB)."""
+    tracemalloc.start()
+    backend = factory()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return backend, current / 1e6, peak / 1e6
+
+
+def _latencies(backend, rows, k):
+    timings = []
+    results = []
+    for row in rows:
+        start = time.perf_counter()
+        _, ids = backend.search_by_id(row, k)
+        timings.append(time.perf_counter() - start)
+        results.append(ids[0])
+    return np.array(timings) * 1000, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=51, help="neighbors per query (Smart Match pool + 1)")
+    args = parser.parse_args()
+
+    faiss_index, embeddings = load_faiss_artifacts()
+    if faiss_index is None:
+        raise SystemExit("FAISS index or embeddings not found")
+    print(f"{len(embeddings):,} vectors of dim {embeddings.shape[1]} "
+          f"({embeddings.nbytes / 1e6:.1f} MB shared embedding matrix)\n")
+
+    rows = np.random.default_rng(0).choice(len(embeddings), size=args.queries, replace=False)
+    backends = {
+        "sklearn": lambda: SklearnVectorIndex(embeddings),
+        "faiss": lambda: FaissVectorIndex(faiss_index, embeddings),
+    }
+
+    neighbors = {}
+    print(f"{'backend':<10} {'build MB':>9} {'peak MB':>8} {'p50 ms':>8} {'p95 ms':>8}")
+    for name, factory in backends.items():
+        backend, held, peak = _build(factory)
+        timings, neighbors[name] = _latencies(backend, rows, args.k)
+        print(f"{name:<10} {held:>9.1f} {peak:>8.1f} "
+              f"{np.percentile(timings, 50):>8.2f} {np.percentile(timings, 95):>8.2f}")
+
+    overlap = np.mean([
+        len(np.intersect1d(a, b)) / len(a) for a, b in zip(neighbors["sklearn"], neighbors["faiss"])
+    ])
+    print(f"\nNeighbor overlap faiss vs sklearn: {overlap:.3f}")
+    print("(the FAISS index memory is shared with Deep Dive, so Smart Match adds nothing on top)")
+
+
+if __name__ == "__main__":
+    main()
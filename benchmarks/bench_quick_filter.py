@@ -0,0 +1,58 @@
+"""
+Compare the Quick Pick filters: full pandas scan vs. the inverted index.
+
+Usage:
+    python -m benchmarks.bench_quick_filter [--csv data/final/books_translated.csv] [--repeat 20]
+"""
+import argparse
+import time
+import numpy as np
+from app.models.quick_model import load_df, apply_multi_filter
+
+# (title_kw, author_kw, genre_kw, lang_kw, pub_kw)
+QUERIES = [
+    ("harry", "", [], "", ""),
+    ("the", "", [], "English", ""),
+    ("", "king", [], "", ""),
+    ("", "", ["Fantasy"], "", ""),
+    ("", "", ["Science Fiction", "Romance"], "Spanish", ""),
+    ("love", "", ["Fiction"], "English", ""),
+    ("a", "", [], "", ""),
+    ("", "", [], "", "penguin"),
+]
+
+
+def _time(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return np.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--csv", default="data/final/books_translated.csv")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    df, _, search_index = load_df(args.csv)
+    print(f"Loaded {len(df):,} rows and built the index in {time.perf_counter() - start:.2f}s\n")
+
+    print(f"{'query':<55} {'rows':>8} {'scan ms':>9} {'index ms':>9} {'speedup':>8}")
+    for query in QUERIES:
+        scan = apply_multi_filter(df, *query, shuffle=False)
+        indexed = apply_multi_filter(df, *query, shuffle=False, search_index=search_index)
+        if not scan.equals(indexed):
+            raise AssertionError(f"Index and scan disagree for {query}")
+
+        scan_ms = _time(lambda: apply_multi_filter(df, *query), args.repeat)
+        index_ms = _time(lambda: apply_multi_filter(df, *query, search_index=search_index), args.repeat)
+        label = repr(tuple(q for q in query if q))
+        print(f"{label:<55} {len(scan):>8,} {scan_ms:>9.2f} {index_ms:>9.2f} {scan_ms / index_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Per-worker memory of pre-forked workers, with artifacts copied into memory vs memory-mapped.
+
+Usage:
+    python -m benchmarks.bench_workers [--workers 4] [--modes copy mmap] [--rounds 20]
+
+Each mode loads the app in a fresh master process and forks the workers the
+way ``gunicorn --preload`` does. Every worker's memory is read from
+/proc/<pid>/smaps_rollup (Linux only) twice: right after fork, and after it
+served ``--rounds`` rounds of requests touching the catalogue, with
+``app.utils.memory.process_memory``. USS (its private pages) is the memory
+private to a worker, i.e. what each extra worker costs.
+
+Only the embeddings and the vector index are memory-mapped. The catalogue's
+string columns are Python objects, shared copy-on-write: updating their
+reference counts copies every page a request touches, so USS after the
+requests is the figure to budget for.
+"""
+import argparse
+import gc
+import json
+import os
+import signal
+import subprocess
+import sys
+from app.utils.memory import process_memory
+
+# One round of requests; {i} is the round number, so rounds reach different rows
+REQUESTS = [
+    ("/quick-pick", {"title_kw": "the", "order_by": "title (A-Z)", "page": "{i}"}),
+    ("/quick-pick", {"genre_kw": "Fantasy", "order_by": "rating (high to low)", "page": "{i}"}),
+    ("/smart-match", {"book_query": "the", "selected_id": "{i}", "top_knn": "5"}),
+    ("/deep-dive", {"query": "a fantasy book with dragons and magic {i}", "top_n": "5"}),
+    ("/api/quick-pick", {"json": {"title": "a", "page": "{i}", "page_size": 100}}),
+    ("/api/deep-dive", {"json": {"query": "love and war in round {i}", "top_n": 20, "mode": "lexical"}}),
+]
+
+
+def _fill(value, i):
+    if isinstance(value, dict):
+        return {key: _fill(v, i) for key, v in value.items()}
+    return value.format(i=i) if isinstance(value, str) else value
+
+
+def _serve(app, go, done, rounds):
+    """Worker body: wait to be measured fresh, handle the requests, report, then wait to be measured again."""
+    os.write(done, b"0")
+    os.read(go, 1)
+    client = app.test_client()
+    for i in range(1, rounds + 1):
+        for path, form in REQUESTS:
+            form = _fill(form, i)
+            if "json" in form:
+                client.post(path, json=form["json"])
+            else:
+                client.post(path, data=form)
+    os.write(done, b"1")
+    signal.pause()
+
+
+def _master(n_workers, rounds):
+    from app import create_app
+    app = create_app()
+    gc.freeze()
+
+    pids, pipes = [], []
+    for _ in range(n_workers):
+        go_read, go_write = os.pipe()
+        done_read, done_write = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            _serve(app, go_read, done_write, rounds)
+            os._exit(0)
+        os.read(done_read, 1)
+        pids.append(pid)
+        pipes.append((go_write, done_read))
+
+    fresh = [process_memory(pid) for pid in pids]
+    for go_write, _ in pipes:
+        os.write(go_write, b"1")
+    for _, done_read in pipes:
+        os.read(done_read, 1)
+    loaded = [process_memory(pid) for pid in pids]
+    for pid in pids:
+        os.kill(pid, signal.SIGTERM)
+        os.waitpid(pid, 0)
+    workers = [{**after, "fresh_private_mb": before["private_mb"]} for before, after in zip(fresh, loaded)]
+    print(json.dumps({"master": process_memory(), "workers": workers}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--modes", nargs="+", default=["copy", "mmap"], choices=["copy", "mmap"])
+    parser.add_argument("--rounds", type=int, default=20, help="rounds of requests each worker serves")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    parser.add_argument("--master", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.master:
+        return _master(args.workers, args.rounds)
+
+    results = {}
+    for mode in args.modes:
+        # Eager warm-up: every stage is loaded before the workers fork
+        env = dict(os.environ, READMEUP_WARMUP="eager", READMEUP_MMAP="1" if mode == "mmap" else "0")
+        proc = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_workers", "--master", "--workers", str(args.workers),
+             "--rounds", str(args.rounds)],
+            capture_output=True, text=True, env=env,
+        )
+        if proc.returncode:
+            raise SystemExit(f"{mode} failed:\n{proc.stderr}")
+        results[mode] = json.loads(proc.stdout.strip().splitlines()[-1])
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'mode':<6} {'master RSS':>11} {'worker RSS':>11} {'worker PSS':>11} {'USS fresh':>10} "
+          f"{'USS loaded':>11} {'total PSS':>10}   (MB, mean per worker)")
+    for mode, r in results.items():
+        workers = r["workers"]
+        mean = {key: sum(w[key] for w in workers) / len(workers) for key in workers[0]}
+        total_pss = r["master"]["pss_mb"] + sum(w["pss_mb"] for w in workers)
+        print(f"{mode:<6} {r['master']['rss_mb']:>11.1f} {mean['rss_mb']:>11.1f} {mean['pss_mb']:>11.1f} "
+              f"{mean['fresh_private_mb']:>10.1f} {mean['private_mb']:>11.1f} {total_pss:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Recall / speed / memory evaluation of the FAISS index types against exact search.
+
+Usage:
+    python -m benchmarks.eval_index [--types flat ivf hnsw ivfpq] [--queries 1000] [--k 10 50]
+
+Indexes are read from the files ``app.models.index_builder`` writes next to the
+``--embeddings`` file when they exist, otherwise built in memory with the builder
+defaults.
+"""
+import argparse
+import os
+import time
+import faiss
+import numpy as np
+from app.models.index_builder import INDEX_TYPES, EMB_PATH, build_index, configure_index, index_path
+
+
+def make_queries(embeddings, n_queries, noise=0.05, seed=0):
+    """Perturbed catalogue vectors, renormalized, standing in for query embeddings."""
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(embeddings), size=min(n_queries, len(embeddings)), replace=False)
+    queries = embeddings[rows] + noise * rng.standard_normal((len(rows), embeddings.shape[1])).astype("float32")
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def recall_at_k(found, truth):
+    """Mean fraction of the exact top-k present in the approximate top-k."""
+    return float(np.mean([len(np.intersect1d(f, t)) / len(t) for f, t in zip(found, truth)]))
+
+
+def evaluate(index, queries, truth, ks, repeat=3):
+    max_k = max(ks)
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        _, found = index.search(queries, max_k)
+        best = min(best, time.perf_counter() - start)
+    return {
+        "recall": {k: recall_at_k(found[:, :k], truth[:, :k]) for k in ks},
+        "qps": len(queries) / best,
+        "memory_mb": faiss.serialize_index(index).nbytes / 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--types", nargs="+", default=list(INDEX_TYPES), choices=INDEX_TYPES)
+    parser.add_argument("--embeddings", default=EMB_PATH)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--k", type=int, nargs="+", default=[10, 50])
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[0], help="IVF nprobe values to sweep (0 = stored)")
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[0], help="HNSW efSearch values to sweep")
+    args = parser.parse_args()
+
+    embeddings = np.ascontiguousarray(np.load(args.embeddings), dtype="float32")
+    queries = make_queries(embeddings, args.queries)
+    exact = faiss.IndexFlatL2(embeddings.shape[1])
+    exact.add(embeddings)
+    _, truth = exact.search(queries, max(args.k))
+    print(f"{len(embeddings):,} vectors, {len(queries):,} queries\n")
+
+    header = f"{'index':<22}" + "".join(f"{'recall@' + str(k):>11}" for k in args.k) + f"{'QPS':>10}{'MB':>9}"
+    print(header)
+    for index_type in args.types:
+        path = index_path(index_type, args.embeddings)
+        index = faiss.read_index(path) if os.path.exists(path) else build_index(embeddings, index_type)
+
+        if index_type in ("ivf", "ivfpq"):
+            settings = [("nprobe", v, dict(nprobe=v)) for v in args.nprobe]
+        elif index_type == "hnsw":
+            settings = [("efSearch", v, dict(ef_search=v)) for v in args.ef_search]
+        else:
+            settings = [(None, None, {})]
+
+        for name, value, kwargs in settings:
+            configure_index(index, **kwargs)
+            result = evaluate(index, queries, truth, args.k)
+            label = index_type if not value else f"{index_type} {name}={value}"
+            print(f"{label:<22}" + "".join(f"{result['recall'][k]:>11.3f}" for k in args.k)
+                  + f"{result['qps']:>10,.0f}{result['memory_mb']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""
+Micro-benchmarks of every mode's hot paths: p50/p95/p99 latency and memory per function.
+
+Usage:
+    python -m benchmarks.synthetic --books 100000 --out /tmp/readmeup-100k
+    python -m benchmarks.suite --root /tmp/readmeup-100k [--repeat 100] [--only quick smart.knn deep]
+    python -m benchmarks.suite --root /tmp/readmeup-100k --save benchmarks/baselines/100k.json
+    python -m benchmarks.suite --root /tmp/readmeup-100k --compare benchmarks/baselines/100k.json
+
+Runs offline: Deep Dive queries are encoded by the stub embedder unless
+--embedder torch or onnx is given. Latency is wall-clock per call after one
+warm-up call. Memory is the peak Python/NumPy allocation of a call
+(tracemalloc), which does not include allocations made inside FAISS.
+--compare exits with status 1 when a p50 or p95 is more than --threshold slower.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import time
+import tracemalloc
+import faiss
+import numpy as np
+import pandas as pd
+
+CASE_GROUPS = ("quick", "smart", "deep")
+
+
+class Case:
+    """A function benchmarked over a fixed list of inputs, called round-robin."""
+
+    def __init__(self, name, fn, inputs):
+        self.name = name
+        self.fn = fn
+        self.inputs = inputs
+
+    def run(self, repeat: int, memory_calls: int = 5) -> dict:
+        self.fn(self.inputs[0])  # warm-up
+        timings = np.empty(repeat)
+        for i in range(repeat):
+            arg = self.inputs[i % len(self.inputs)]
+            start = time.perf_counter()
+            self.fn(arg)
+            timings[i] = time.perf_counter() - start
+        timings *= 1000
+
+        peak = 0
+        tracemalloc.start()
+        for arg in self.inputs[:memory_calls]:
+            tracemalloc.reset_peak()
+            self.fn(arg)
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+        return {
+            "calls": repeat,
+            "mean_ms": round(float(timings.mean()), 4),
+            "p50_ms": round(float(np.percentile(timings, 50)), 4),
+            "p95_ms": round(float(np.percentile(timings, 95)), 4),
+            "p99_ms": round(float(np.percentile(timings, 99)), 4),
+            "peak_mb": round(peak / 1e6, 3),
+        }
+
+
+def _timed(setup, name, fn):
+    start = time.perf_counter()
+    value = fn()
+    setup[name] = round(time.perf_counter() - start, 4)
+    return value
+
+
+def _quick_filters(df, rng, n=8):
+    """(title_kw, author_kw, genre_kw, lang_kw, pub_kw) tuples drawn from the catalogue itself."""
+    rows = df.iloc[rng.choice(len(df), size=n, replace=False)]
+    filters = []
+    for i, (_, row) in enumerate(rows.iterrows()):
+        words = row["title"].split()
+        genres = [g.strip() for g in row["genres"].split(",") if g.strip()]
+        filters.append([
+            (words[0], "", [], "", ""),
+            ("", row["author"].split(",")[0].split()[-1], [], "", ""),
+            ("", "", genres[:1], "", ""),
+            ("", "", genres[:2], row["language"], ""),
+            (words[-1], "", [], "English", ""),
+            ("", "", [], "", row["publisher"].split()[0]),
+        ][i % 6])
+    return filters
+
+
+def quick_cases(csv_path, rng, setup):
+    from app.models.quick_model import load_df, apply_multi_filter
+    from app.utils.sorting import sort_df_by_title_lns
+
+    df, _, search_index = _timed(setup, "quick.load_df", lambda: load_df(csv_path))
+    filters = _quick_filters(df, rng)
+    subsets = [apply_multi_filter(df, *f, shuffle=False, search_index=search_index) for f in filters]
+    return [
+        Case("quick.apply_multi_filter[scan]", lambda f: apply_multi_filter(df, *f, seed=0), filters),
+        Case("quick.apply_multi_filter[index]",
+             lambda f: apply_multi_filter(df, *f, seed=0, search_index=search_index), filters),
+        Case("quick.sort_df_by_title_lns[filtered]", sort_df_by_title_lns, subsets),
+        Case("quick.sort_df_by_title_lns[full]", sort_df_by_title_lns, [df]),
+    ]
+
+
+def smart_cases(csv_path, rng, setup, embeddings, faiss_index):
+    from app.models.smart_model import load_df_knn, prepare_knn, knn_recommend
+
+    df, lookup = _timed(setup, "smart.load_df_knn", lambda: load_df_knn(csv_path))
+    seeds = [(int(row), bool(i % 2), bool(i % 3 == 0))
+             for i, row in enumerate(rng.choice(len(df), size=min(200, len(df)), replace=False))]
+    cases = []
+    backends = {"faiss": faiss_index, "sklearn": None} if faiss_index is not None else {"sklearn": None}
+    for backend, index in backends.items():
+        knn = prepare_knn(df, embeddings, index)
+        cases.append(Case(
+            f"smart.knn_recommend[{backend}]",
+            lambda s, knn=knn: knn_recommend(None, s[1], s[2], 5, df, embeddings, knn, book_id=s[0], lookup=lookup,
+                                             seed=0),
+            seeds,
+        ))
+    return cases
+
+
+def deep_cases(csv_path, rng, setup, embeddings, faiss_index, embedder):
+    from app.models.catalogue import load_catalogue
+    from app.models.deep_model import SearchFilters, build_lexical_index, semantic_recommend, RETRIEVAL_MODES
+    from app.utils.vector_index import FaissVectorIndex, SklearnVectorIndex
+
+    df = load_catalogue(csv_path).view("deep")
+    filters = _timed(setup, "deep.search_filters", lambda: SearchFilters(df))
+    lexical_index = _timed(setup, "deep.lexical_index", lambda: build_lexical_index(df))
+    vector_index = FaissVectorIndex(faiss_index, embeddings) if faiss_index is not None \
+        else SklearnVectorIndex(embeddings)
+
+    # Queries made of description words, half of them filtered by language or rating
+    descriptions = df["description"].iloc[rng.choice(len(df), size=50, replace=False)]
+    requests = []
+    for i, text in enumerate(descriptions):
+        words = text.split()
+        query = " ".join(rng.choice(words, size=min(len(words), 8), replace=False))
+        language, min_rating = [(None, 0.0), (None, 0.0), ("Spanish", 0.0), (None, 4.0)][i % 4]
+        requests.append((query, language, min_rating))
+
+    return [
+        Case(
+            f"deep.semantic_recommend[{mode}]",
+            lambda r, mode=mode: semantic_recommend(
+                r[0], df, embedder, vector_index, top_n=5, language=r[1], min_rating=r[2], filters=filters,
+                seed=0, lexical_index=lexical_index, mode=mode,
+            ),
+            requests,
+        )
+        for mode in RETRIEVAL_MODES
+    ]
+
+
+def _embedder(name, dim):
+    """The stub embedder sized to the embeddings, else the configured model (see ``main``)."""
+    if name == "stub":
+        from app.utils.stub_embedder import StubEmbedder
+        return StubEmbedder(dim)
+    from app.models.deep_model import load_embedder
+    return load_embedder()
+
+
+def run(root, repeat, only=None, embedder="stub", seed=0) -> dict:
+    """Builds every case over the catalogue in ``root`` and runs those matching ``only``."""
+    final_dir = os.path.join(root, "data", "final")
+    csv_path = os.path.join(final_dir, "books_translated.csv")
+    if not os.path.exists(csv_path):
+        raise SystemExit(f"{csv_path} not found; generate one with python -m benchmarks.synthetic")
+    from app.models.catalogue import load_catalogue
+
+    rng = np.random.default_rng(seed)
+    setup = {}
+    catalogue = _timed(setup, "catalogue.load", lambda: load_catalogue(csv_path))
+    embeddings = np.load(os.path.join(final_dir, "embeddings.npy"))
+    faiss_index = None
+    if os.path.exists(os.path.join(final_dir, "faiss_index.idx")):
+        faiss_index = faiss.read_index(os.path.join(final_dir, "faiss_index.idx"))
+
+    def wanted(name):
+        return not only or any(name.startswith(prefix) or prefix.startswith(name + ".") for prefix in only)
+
+    cases = []
+    if wanted("quick"):
+        cases += quick_cases(csv_path, rng, setup)
+    if wanted("smart"):
+        cases += smart_cases(csv_path, rng, setup, embeddings, faiss_index)
+    if wanted("deep"):
+        cases += deep_cases(csv_path, rng, setup, embeddings, faiss_index, _embedder(embedder, embeddings.shape[1]))
+
+    results = {case.name: case.run(repeat) for case in cases if wanted(case.name)}
+    return {
+        "meta": {
+            "books": len(catalogue),
+            "dim": int(embeddings.shape[1]),
+            "embedder": embedder,
+            "repeat": repeat,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "faiss": getattr(faiss, "__version__", "?"),
+            "machine": f"{platform.system()} {platform.machine()}, {os.cpu_count()} CPUs",
+            "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        },
+        "setup_seconds": setup,
+        "results": results,
+    }
+
+
+def compare(report, baseline, threshold) -> list:
+    """Names of the functions whose p50 or p95 is more than ``threshold`` slower than ``baseline``."""
+    if report["meta"]["books"] != baseline["meta"]["books"]:
+        print(f"warning: baseline ran on {baseline['meta']['books']:,} books, this run on "
+              f"{report['meta']['books']:,}\n")
+    print(f"{'function':<42} {'p50 ms':>9} {'base':>9} {'p95 ms':>9} {'base':>9} {'change':>8}")
+    regressions = []
+    for name, r in report["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            print(f"{name:<42} {r['p50_ms']:>9.3f} {'-':>9} {r['p95_ms']:>9.3f} {'-':>9} {'new':>8}")
+            continue
+        change = max(r["p50_ms"] / base["p50_ms"], r["p95_ms"] / base["p95_ms"]) - 1
+        flag = "  SLOWER" if change > threshold else ""
+        if flag:
+            regressions.append(name)
+        print(f"{name:<42} {r['p50_ms']:>9.3f} {base['p50_ms']:>9.3f} {r['p95_ms']:>9.3f} {base['p95_ms']:>9.3f} "
+              f"{change:>+7.0%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--root", default=".", help="directory holding data/final/ (default: the repo's own data)")
+    parser.add_argument("--repeat", type=int, default=100, help="timed calls per function")
+    parser.add_argument("--only", nargs="+", metavar="PREFIX",
+                        help=f"run the functions whose name starts with a prefix (groups: {', '.join(CASE_GROUPS)})")
+    parser.add_argument("--embedder", default="stub", choices=["stub", "torch", "onnx"])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", metavar="JSON", help="write the results as a baseline")
+    parser.add_argument("--compare", metavar="JSON", help="compare against a saved baseline")
+    parser.add_argument("--threshold", type=float, default=0.2, help="relative slowdown reported as a regression")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    # Read by app.config on first import
+    os.environ["READMEUP_EMBEDDER_BACKEND"] = args.embedder
+    report = run(args.root, args.repeat, args.only, args.embedder, args.seed)
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    elif args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+    else:
+        meta = report["meta"]
+        print(f"{meta['books']:,} books, dim {meta['dim']}, {meta['embedder']} embedder, {meta['repeat']} calls each")
+        print("setup: " + ", ".join(f"{name} {s:.2f}s" for name, s in report["setup_seconds"].items()) + "\n")
+        print(f"{'function':<42} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'peak MB':>8}")
+        for name, r in report["results"].items():
+            print(f"{name:<42} {r['p50_ms']:>9.3f} {r['p95_ms']:>9.3f} {r['p99_ms']:>9.3f} {r['peak_mb']:>8.2f}")
+        print(f"\nmax RSS {meta['max_rss_mb']:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
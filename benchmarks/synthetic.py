@@ -0,0 +1,192 @@
+"""
+Deterministic synthetic catalogues for benchmarking at scale.
+
+Usage:
+    python -m benchmarks.synthetic --books 100000 --out /tmp/readmeup-100k [--dim 384] [--seed 0] [--no-index]
+
+Writes <out>/data/final/books_translated.csv, embeddings.npy and faiss_index.idx,
+laid out like data/final, so the app and the benchmarks can run against it
+(``python -m benchmarks.suite --root <out>``, or start the app from <out>).
+The same --books/--dim/--seed always give the same files.
+
+Authors, publishers, genres and description words follow Zipf-like
+popularity, most books are in English and a few are in a series, so filters
+and indexes see realistic skew. Embeddings are random unit vectors pulled
+towards a centroid per primary genre, so nearest neighbors cluster by genre.
+"""
+import argparse
+import os
+import time
+import numpy as np
+import pandas as pd
+
+GENRES = [
+    "Fiction", "Fantasy", "Romance", "Young Adult", "Classics", "Mystery", "Nonfiction", "Historical Fiction",
+    "Science Fiction", "Thriller", "Contemporary", "Paranormal", "Horror", "Childrens", "Adventure", "Humor",
+    "Historical", "Crime", "Literature", "Magic", "Poetry", "Biography", "History", "Philosophy", "Memoir",
+    "Dystopia", "Urban Fantasy", "Epic Fantasy", "Chick Lit", "Graphic Novels", "Self Help", "Psychology",
+    "Science", "Religion", "Short Stories", "Drama", "Travel", "Art", "Cookbooks", "Sports",
+]
+
+# (raw CSV value, share of books); several spellings of a language exercise the normalization
+LANGUAGES = [
+    ("English", 0.70), ("en", 0.04), ("en-US", 0.02), ("Spanish", 0.04), ("es", 0.01), ("French", 0.03),
+    ("fr", 0.01), ("German", 0.03), ("Italian", 0.02), ("Portuguese", 0.01), ("pt-br", 0.01),
+    ("Japanese", 0.01), ("Dutch", 0.01), ("Russian", 0.01), ("Arabic", 0.005), ("Turkish", 0.005),
+    ("Polish", 0.005), ("Greek, Modern (1453-)", 0.005), ("", 0.02),
+]
+
+TITLE_WORDS = (
+    "the of and a in night king queen house shadow fire love war city river secret girl boy magic star dark light "
+    "blood heart lost last first little dream death life world witch dragon moon sea storm stone crown silver gold "
+    "garden winter summer return empire song bones glass iron wild ghost heir road journey daughter son game truth "
+    "lies ash sky rose thorn court kingdom forest hidden broken fallen rising tale legend girl's man's school"
+).split()
+
+DESCRIPTION_WORDS = (
+    "the a and to of in is his her she he that with for as on when but their they was by from an be this who "
+    "it one has life new world must story find love family only into all what her him will more about years "
+    "young woman man time after friend before between secret past dark power mother father discover begins "
+    "journey war town city home year novel history first way things ever never while stranger dangerous murder "
+    "magic heart truth another survive search mysterious team small beautiful kingdom forces everything "
+    "everyone nothing whose lives finds must face begins left old returns school girl boy death himself "
+    "herself thought hope fight save friends daughter son wife husband brother sister together against across "
+    "through under dream world's fate destiny legacy empire rebellion ancient curse prophecy detective "
+    "investigation romance wedding summer winter island village ocean mountain desert space planet ship"
+).split()
+
+_SYLLABLES = "ka lo mi ra te su na vi do ze ri ma lu pe ko sa ti ne ba ru fe ho ja qu we xi yo zu ch th".split()
+
+
+def zipf_weights(n: int, exponent: float = 1.1) -> np.ndarray:
+    """Probabilities proportional to 1 / rank**exponent."""
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    return weights / weights.sum()
+
+
+def _vocabulary(rng, words, n_extra):
+    """``words`` followed by ``n_extra`` made-up words, for a long tail of rare terms."""
+    parts = rng.choice(_SYLLABLES, size=(n_extra, 3))
+    lengths = rng.integers(2, 4, size=n_extra)
+    made_up = ["".join(row[:k]) for row, k in zip(parts, lengths)]
+    return np.array(list(dict.fromkeys(list(words) + made_up)), dtype=object)
+
+
+def _join(vocab, rng, probs, lengths, sep=" "):
+    """One string per entry of ``lengths``, joining that many words drawn from ``vocab``."""
+    draws = vocab[rng.choice(len(vocab), size=(len(lengths), int(lengths.max())), p=probs)]
+    return [sep.join(row[:k]) for row, k in zip(draws, lengths)]
+
+
+class CatalogueGenerator:
+    """Draws catalogue rows chunk by chunk from pools fixed at construction."""
+
+    def __init__(self, n_books: int, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        self.n_books = n_books
+        self.seed = seed
+        names = rng.choice(_vocabulary(rng, [], 4000), size=(max(100, n_books // 8), 2))
+        self.authors = np.array([f"{first.title()} {last.title()}" for first, last in names], dtype=object)
+        self.author_p = zipf_weights(len(self.authors), 0.6)
+        self.publishers = np.array([f"{w.title()} Press" for w in _vocabulary(rng, [], max(50, n_books // 200))],
+                                   dtype=object)
+        self.publisher_p = zipf_weights(len(self.publishers))
+        self.genre_p = zipf_weights(len(GENRES), 0.8)
+        self.languages = np.array([v for v, _ in LANGUAGES], dtype=object)
+        self.language_p = np.array([p for _, p in LANGUAGES]) / sum(p for _, p in LANGUAGES)
+        self.title_vocab = _vocabulary(rng, TITLE_WORDS, 2000)
+        self.title_p = zipf_weights(len(self.title_vocab))
+        self.desc_vocab = _vocabulary(rng, DESCRIPTION_WORDS, 20000)
+        self.desc_p = zipf_weights(len(self.desc_vocab))
+        self.n_series = max(10, n_books // 30)
+
+    def chunk(self, start: int, stop: int):
+        """Rows [start, stop) as a DataFrame, plus the primary genre index of each row."""
+        rng = np.random.default_rng([self.seed, 1, start])
+        n = stop - start
+
+        titles = _join(self.title_vocab, rng, self.title_p, rng.integers(1, 6, size=n))
+        # A few titles start with digits or symbols, to exercise the letters/numbers/symbols ordering
+        prefix = rng.choice(["", "1", "¿"], size=n, p=[0.9, 0.05, 0.05])
+        titles = [p + t.title() for p, t in zip(prefix, titles)]
+
+        n_authors = rng.choice([1, 2, 3], size=n, p=[0.85, 0.12, 0.03])
+        authors = _join(self.authors, rng, self.author_p, n_authors, sep=", ")
+
+        n_genres = rng.integers(1, 7, size=n)
+        genre_draws = rng.choice(len(GENRES), size=(n, 6), p=self.genre_p)
+        genre_lists = [list(dict.fromkeys(GENRES[g] for g in row[:k])) for row, k in zip(genre_draws, n_genres)]
+        primary = genre_draws[:, 0]
+
+        ratings = np.round(1 + 4 * rng.beta(8, 2.5, size=n), 2)
+        ratings[rng.random(n) < 0.02] = np.nan
+        num_ratings = np.floor(rng.lognormal(5, 2, size=n)).astype(np.int64)
+
+        series = np.where(rng.random(n) < 0.25, [f"Series {s}" for s in rng.integers(0, self.n_series, size=n)], "")
+
+        df = pd.DataFrame({
+            "title": titles,
+            "series": series,
+            "author": authors,
+            "rating": ratings,
+            "description": _join(self.desc_vocab, rng, self.desc_p, rng.integers(15, 80, size=n)),
+            "language": self.languages[rng.choice(len(self.languages), size=n, p=self.language_p)],
+            "genres": [str(g) for g in genre_lists],
+            "publisher": self.publishers[rng.choice(len(self.publishers), size=n, p=self.publisher_p)],
+            "numRatings": num_ratings,
+            "coverImg": [f"https://example.com/covers/{i}.jpg" for i in range(start, stop)],
+        }, index=pd.RangeIndex(start, stop))
+        return df, primary
+
+
+def unit_embeddings(primary: np.ndarray, dim: int, seed: int, start: int, genre_weight: float = 0.6) -> np.ndarray:
+    """Random unit vectors, each pulled towards the centroid of its primary genre."""
+    centroids = np.random.default_rng([seed, 2]).standard_normal((len(GENRES), dim)).astype(np.float32)
+    centroids /= np.linalg.norm(centroids, axis=1, keepdims=True)
+    noise = np.random.default_rng([seed, 3, start]).standard_normal((len(primary), dim)).astype(np.float32)
+    noise /= np.linalg.norm(noise, axis=1, keepdims=True)
+    vectors = genre_weight * centroids[primary] + (1 - genre_weight) * noise
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def generate(out_dir: str, n_books: int, dim: int = 384, seed: int = 0, chunk_size: int = 100_000,
+             with_index: bool = True) -> str:
+    """Writes a synthetic data/final under ``out_dir``; returns the CSV path."""
+    final_dir = os.path.join(out_dir, "data", "final")
+    os.makedirs(final_dir, exist_ok=True)
+    csv_path = os.path.join(final_dir, "books_translated.csv")
+    emb_path = os.path.join(final_dir, "embeddings.npy")
+
+    generator = CatalogueGenerator(n_books, seed)
+    embeddings = np.lib.format.open_memmap(emb_path, mode="w+", dtype=np.float32, shape=(n_books, dim))
+    for start in range(0, n_books, chunk_size):
+        stop = min(start + chunk_size, n_books)
+        df, primary = generator.chunk(start, stop)
+        df.to_csv(csv_path, mode="w" if start == 0 else "a", header=start == 0)
+        embeddings[start:stop] = unit_embeddings(primary, dim, seed, start)
+    embeddings.flush()
+
+    if with_index:
+        import faiss
+        from app.models.index_builder import build_index
+        faiss.write_index(build_index(embeddings, "flat"), os.path.join(final_dir, "faiss_index.idx"))
+    return csv_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--books", type=int, default=100_000)
+    parser.add_argument("--out", required=True, help="directory receiving data/final/")
+    parser.add_argument("--dim", type=int, default=384, help="embedding dimension (all-MiniLM-L6-v2: 384)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk", type=int, default=100_000, help="rows generated at a time")
+    parser.add_argument("--no-index", action="store_true", help="skip the flat FAISS index")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    csv_path = generate(args.out, args.books, args.dim, args.seed, args.chunk, not args.no_index)
+    print(f"Wrote {args.books:,} books to {os.path.dirname(csv_path)} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
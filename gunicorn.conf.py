@@ -0,0 +1,26 @@
+"""
+Pre-forked serving:
+
+    gunicorn -c gunicorn.conf.py run:app
+
+The app is loaded in the master before fork, with the embeddings and vector
+index memory-mapped read-only, so every worker shares the same pages. The
+catalogue is not mapped: its string columns are Python objects shared
+copy-on-write, and the reference counts requests update copy the pages they
+touch into each worker (benchmarks.bench_workers measures USS after a load).
+"""
+import gc
+import os
+
+# Load everything before fork (threads started in the master do not survive it)
+os.environ.setdefault("READMEUP_WARMUP", "eager")
+os.environ.setdefault("READMEUP_MMAP", "1")
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '7860')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", "4"))
+preload_app = True
+
+
+def when_ready(server):
+    # Keep the cyclic GC from writing to (and so copying) the pages of objects loaded before fork
+    gc.freeze()